@@ -2,7 +2,7 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-from utils.data_loader import cargar_datos, get_restaurante_color
+from utils.data_loader import cargar_datos, get_restaurante_color, get_reporte_memoria
 # ==========================================
 # CONFIGURACIÓN
 # ==========================================
@@ -58,7 +58,7 @@ st.markdown("""
 # ==========================================
 # CARGAR DATOS
 # ==========================================
-df = cargar_datos()
+df = cargar_datos(columnas=['fecha', 'restaurante', 'producto', 'venta_pesos', 'cantidad_vendida_diaria'])
 if df is None:
     st.error("❌ No se pudieron cargar los datos. Verifica la carpeta /data/")
     st.stop()
@@ -80,6 +80,10 @@ with st.sidebar:
     st.metric("Período", f"{df['fecha'].min().date()} a {df['fecha'].max().date()}")
     st.metric("Total Días", df['fecha'].nunique())
 
+    reporte_memoria = get_reporte_memoria(df)
+    if reporte_memoria:
+        st.caption(f"💾 Memoria: {reporte_memoria['despues']:.1f} MB (sin esquema tipado: {reporte_memoria['antes']:.1f} MB)")
+
     st.markdown("---")
 
     st.header("🎨 Vista Rápida")
@@ -147,7 +151,7 @@ st.markdown("---")
 # Comparativa
 st.header("🏆 Performance por Restaurante")
 import plotly.express as px
-ventas_rest = df.groupby('restaurante')['venta_pesos'].sum().sort_values(ascending=False)
+ventas_rest = df.groupby('restaurante', observed=True)['venta_pesos'].sum().sort_values(ascending=False)
 fig = px.bar(
     x=ventas_rest.index,
     y=ventas_rest.values,
@@ -8,7 +8,7 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from utils.data_loader import cargar_datos, get_restaurante_color, formatear_numero
-from utils.metrics import calcular_metricas_anuales
+from utils.metrics import COLUMNAS_CUBO, consultar_metricas_anuales, filtrar_cubo, get_cubo_ventas, get_metricas_anuales, posiciones_top_k, resumir_productos
 
 st.set_page_config(page_title="Vista Anual", page_icon="📅", layout="wide")
 
@@ -51,12 +51,15 @@ st.markdown("""
 # CARGAR DATOS
 # ==========================================
 
-df = cargar_datos()
+df = cargar_datos(columnas=COLUMNAS_CUBO)
 
 if df is None:
     st.error("❌ Error cargando datos")
     st.stop()
 
+# Agregados de esta versión de los datos (se construyen una vez)
+cubo = get_cubo_ventas(df)
+
 # ==========================================
 # HEADER Y FILTROS
 # ==========================================
@@ -68,7 +71,7 @@ st.markdown("---")
 col1, col2, col3 = st.columns([2, 2, 2])
 
 with col1:
-    años_disponibles = sorted(df['año'].unique(), reverse=True)
+    años_disponibles = sorted(cubo['mensual']['año'].unique(), reverse=True)
     año_seleccionado = st.selectbox(
         "📅 Selecciona el año",
         años_disponibles,
@@ -76,7 +79,7 @@ with col1:
     )
 
 with col2:
-    restaurantes = ['Todos'] + sorted(df['restaurante'].unique().tolist())
+    restaurantes = ['Todos'] + sorted(cubo['mensual']['restaurante'].unique().tolist())
     restaurante_sel = st.selectbox(
         "🏪 Selecciona restaurante",
         restaurantes,
@@ -97,25 +100,31 @@ with col3:
 st.markdown("---")
 
 # FILTRAR DATOS
-if restaurante_sel == 'Todos':
-    df_filtrado = df[df['año'] == año_seleccionado]
-else:
-    df_filtrado = df[(df['año'] == año_seleccionado) & (df['restaurante'] == restaurante_sel)]
+filtros = {
+    'año': año_seleccionado,
+    'restaurante': None if restaurante_sel == 'Todos' else restaurante_sel
+}
 
-if len(df_filtrado) == 0:
+# Métricas precalculadas de todos los años y restaurantes
+metricas_año = consultar_metricas_anuales(get_metricas_anuales(df), **filtros)
+
+if metricas_año is None:
     st.warning(f"No hay datos para {restaurante_sel} en {año_seleccionado}")
     st.stop()
 
+ventas_productos = filtrar_cubo(cubo, 'diario_producto', **filtros)
+ventas_mensuales = filtrar_cubo(cubo, 'mensual', **filtros)
+
 # ==========================================
 # MÉTRICAS ANUALES
 # ==========================================
 
 st.header(f"📊 Indicadores Clave {año_seleccionado}")
 
-ventas_totales = df_filtrado['venta_pesos'].sum()
-unidades_totales = df_filtrado['cantidad_vendida_diaria'].sum()
-dias_operacion = df_filtrado['fecha'].nunique()
-productos_activos = df_filtrado['producto'].nunique()
+ventas_totales = metricas_año['ventas_totales']
+unidades_totales = metricas_año['unidades_totales']
+dias_operacion = metricas_año['dias_operacion']
+productos_activos = metricas_año['productos_activos']
 
 col1, col2, col3, col4 = st.columns(4)
 
@@ -159,7 +168,7 @@ st.markdown("<br>", unsafe_allow_html=True)
 
 st.header("📈 Tendencia Mensual")
 
-ventas_mes = df_filtrado.groupby(['mes', 'mes_nombre'])['venta_pesos'].sum().reset_index()
+ventas_mes = ventas_mensuales.groupby(['mes', 'mes_nombre'], observed=True)['venta_pesos'].sum().reset_index()
 ventas_mes = ventas_mes.sort_values('mes')
 
 fig = px.bar(
@@ -211,7 +220,7 @@ if restaurante_sel == 'Todos':
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        ventas_rest_mes = df_filtrado.groupby(['mes_nombre', 'restaurante'])['venta_pesos'].sum().reset_index()
+        ventas_rest_mes = ventas_mensuales.groupby(['mes_nombre', 'restaurante'], observed=True)['venta_pesos'].sum().reset_index()
         
         fig = px.line(
             ventas_rest_mes,
@@ -221,13 +230,13 @@ if restaurante_sel == 'Todos':
             title='Evolución Mensual por Restaurante',
             labels={'mes_nombre': 'Mes', 'venta_pesos': 'Ventas (COP)', 'restaurante': 'Restaurante'},
             markers=True,
-            color_discrete_map={r: get_restaurante_color(r) for r in df['restaurante'].unique()}
+            color_discrete_map={r: get_restaurante_color(r) for r in restaurantes[1:]}
         )
         fig.update_layout(height=400)
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
-        ventas_rest = df_filtrado.groupby('restaurante')['venta_pesos'].sum().sort_values(ascending=False)
+        ventas_rest = ventas_mensuales.groupby('restaurante', observed=True)['venta_pesos'].sum().sort_values(ascending=False)
         
         st.subheader("Ranking Anual")
         
@@ -258,7 +267,7 @@ dias_esp = {
     'Thursday': 'Jueves', 'Friday': 'Viernes', 'Saturday': 'Sábado', 'Sunday': 'Domingo'
 }
 
-ventas_dia = df_filtrado.groupby('dia_semana')['venta_pesos'].sum()
+ventas_dia = filtrar_cubo(cubo, 'dia_semana', **filtros).groupby('dia_semana', observed=True)['venta_pesos'].sum()
 ventas_dia = ventas_dia.reindex(dias_orden)
 ventas_dia.index = [dias_esp[d] for d in ventas_dia.index]
 
@@ -305,10 +314,11 @@ st.markdown("---")
 
 st.header("⭐ Top 10 Productos del Año")
 
-top_productos = df_filtrado.groupby('producto').agg({
-    'venta_pesos': 'sum',
-    'cantidad_vendida_diaria': 'sum'
-}).sort_values('venta_pesos', ascending=False).head(10)
+resumen_productos = resumir_productos(ventas_productos)
+
+top_productos = resumen_productos[['venta_pesos', 'cantidad_vendida_diaria']].iloc[
+    posiciones_top_k(resumen_productos['venta_pesos'], 10)
+]
 
 fig = go.Figure(go.Bar(
     y=top_productos.index,
@@ -342,8 +352,8 @@ st.header("📋 Resumen Ejecutivo")
 
 col1, col2, col3 = st.columns(3)
 
-ventas_promedio_dia = df_filtrado.groupby('fecha')['venta_pesos'].sum().mean()
-producto_estrella = df_filtrado.groupby('producto')['venta_pesos'].sum().idxmax()
+ventas_promedio_dia = metricas_año['ventas_promedio_dia']
+producto_estrella = metricas_año['producto_estrella']
 ticket_promedio = ventas_totales / unidades_totales if unidades_totales > 0 else 0
 
 with col1:
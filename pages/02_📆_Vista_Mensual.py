@@ -8,6 +8,7 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from utils.data_loader import cargar_datos, get_restaurante_color
+from utils.metrics import COLUMNAS_CUBO, consultar_resumen_mensual, filtrar_cubo, get_cubo_ventas, get_resumen_mensual
 
 st.set_page_config(page_title="Vista Mensual", page_icon="📆", layout="wide")
 
@@ -15,12 +16,15 @@ st.set_page_config(page_title="Vista Mensual", page_icon="📆", layout="wide")
 # CARGAR DATOS
 # ==========================================
 
-df = cargar_datos()
+df = cargar_datos(columnas=COLUMNAS_CUBO)
 
 if df is None:
     st.error("❌ Error cargando datos")
     st.stop()
 
+# Agregados de esta versión de los datos (se construyen una vez)
+cubo = get_cubo_ventas(df)
+
 # ==========================================
 # HEADER Y FILTROS
 # ==========================================
@@ -31,15 +35,15 @@ st.markdown("---")
 col1, col2, col3, col4 = st.columns([1, 1, 2, 1])
 
 with col1:
-    años = sorted(df['año'].unique(), reverse=True)
+    años = sorted(cubo['mensual']['año'].unique(), reverse=True)
     año_sel = st.selectbox("📅 Año", años, index=0)
 
 with col2:
-    meses_disponibles = sorted(df[df['año'] == año_sel]['mes'].unique(), reverse=True)
+    meses_disponibles = sorted(cubo['mensual'][cubo['mensual']['año'] == año_sel]['mes'].unique(), reverse=True)
     mes_sel = st.selectbox("📆 Mes", meses_disponibles, index=0)
 
 with col3:
-    restaurantes = ['Todos'] + sorted(df['restaurante'].unique().tolist())
+    restaurantes = ['Todos'] + sorted(cubo['mensual']['restaurante'].unique().tolist())
     restaurante_sel = st.selectbox("🏪 Restaurante", restaurantes, index=0)
 
 with col4:
@@ -56,25 +60,17 @@ with col4:
 st.markdown("---")
 
 # FILTRAR DATOS
-if restaurante_sel == 'Todos':
-    df_mes = df[(df['año'] == año_sel) & (df['mes'] == mes_sel)]
-else:
-    df_mes = df[(df['año'] == año_sel) & (df['mes'] == mes_sel) & (df['restaurante'] == restaurante_sel)]
+restaurante_filtro = None if restaurante_sel == 'Todos' else restaurante_sel
+
+diario_mes = filtrar_cubo(cubo, 'diario', año=año_sel, mes=mes_sel, restaurante=restaurante_filtro)
+
+# Resumen precalculado del mes (incluye la comparación con el mes anterior)
+resumen_mes = consultar_resumen_mensual(get_resumen_mensual(df), año_sel, mes_sel, restaurante_filtro)
 
-if len(df_mes) == 0:
+if resumen_mes is None:
     st.warning(f"No hay datos para {restaurante_sel} en este mes")
     st.stop()
 
-# Mes anterior para comparación
-if mes_sel > 1:
-    df_mes_anterior = df[(df['año'] == año_sel) & (df['mes'] == mes_sel - 1)]
-    if restaurante_sel != 'Todos':
-        df_mes_anterior = df_mes_anterior[df_mes_anterior['restaurante'] == restaurante_sel]
-else:
-    df_mes_anterior = df[(df['año'] == año_sel - 1) & (df['mes'] == 12)]
-    if restaurante_sel != 'Todos':
-        df_mes_anterior = df_mes_anterior[df_mes_anterior['restaurante'] == restaurante_sel]
-
 # ==========================================
 # MÉTRICAS
 # ==========================================
@@ -87,15 +83,14 @@ meses_nombres = {
 
 st.header(f"📊 {meses_nombres[mes_sel]} {año_sel}")
 
-ventas_mes = df_mes['venta_pesos'].sum()
-ventas_anterior = df_mes_anterior['venta_pesos'].sum()
-cambio = ((ventas_mes - ventas_anterior) / ventas_anterior * 100) if ventas_anterior > 0 else 0
+ventas_mes = resumen_mes['ventas_totales']
+cambio = resumen_mes['cambio_vs_anterior']
 
-dias_operacion = df_mes['fecha'].nunique()
-ventas_prom_dia = df_mes.groupby('fecha')['venta_pesos'].sum().mean()
+dias_operacion = int(resumen_mes['dias_operacion'])
+ventas_prom_dia = resumen_mes['ventas_promedio_dia']
 
 # Mejor día semana
-mejor_dia_sem = df_mes.groupby('dia_semana')['venta_pesos'].sum().idxmax()
+mejor_dia_sem = resumen_mes['mejor_dia_semana']
 
 col1, col2, col3, col4 = st.columns(4)
 
@@ -135,7 +130,7 @@ st.markdown("---")
 
 st.header("📈 Evolución Diaria del Mes")
 
-ventas_diarias = df_mes.groupby('fecha')['venta_pesos'].sum().reset_index()
+ventas_diarias = diario_mes.groupby('fecha')['venta_pesos'].sum().reset_index()
 
 fig = px.line(
     ventas_diarias,
@@ -163,10 +158,10 @@ st.plotly_chart(fig, use_container_width=True)
 # MEJORES Y PEORES DÍAS
 # ==========================================
 
-mejor_fecha = ventas_diarias.loc[ventas_diarias['venta_pesos'].idxmax(), 'fecha']
-peor_fecha = ventas_diarias.loc[ventas_diarias['venta_pesos'].idxmin(), 'fecha']
-venta_mejor = ventas_diarias['venta_pesos'].max()
-venta_peor = ventas_diarias['venta_pesos'].min()
+mejor_fecha = resumen_mes['mejor_dia']
+peor_fecha = resumen_mes['peor_dia']
+venta_mejor = resumen_mes['venta_mejor_dia']
+venta_peor = resumen_mes['venta_peor_dia']
 
 col1, col2 = st.columns(2)
 
@@ -199,7 +194,7 @@ st.markdown("---")
 if restaurante_sel == 'Todos':
     st.header("🏪 Performance por Restaurante")
     
-    ventas_rest = df_mes.groupby('restaurante')['venta_pesos'].sum().sort_values(ascending=False)
+    ventas_rest = diario_mes.groupby('restaurante', observed=True)['venta_pesos'].sum().sort_values(ascending=False)
     
     col1, col2 = st.columns([2, 1])
     
@@ -239,7 +234,7 @@ if restaurante_sel == 'Todos':
 
 st.header("⭐ Top 5 Productos del Mes")
 
-top_5 = df_mes.groupby('producto')['venta_pesos'].sum().nlargest(5)
+top_5 = resumen_mes['top_productos'].head(5)
 
 fig = go.Figure(go.Bar(
     x=top_5.values,
@@ -274,8 +269,8 @@ st.header("💡 Insights del Mes")
 col1, col2 = st.columns(2)
 
 with col1:
-    ventas_fds = df_mes[df_mes['es_fin_semana'] == 1]['venta_pesos'].sum()
-    ventas_semana = df_mes[df_mes['es_fin_semana'] == 0]['venta_pesos'].sum()
+    ventas_fds = diario_mes[diario_mes['es_fin_semana'] == 1]['venta_pesos'].sum()
+    ventas_semana = diario_mes[diario_mes['es_fin_semana'] == 0]['venta_pesos'].sum()
     
     if ventas_semana > 0:
         ratio_fds = (ventas_fds / ventas_semana) * 100
@@ -8,6 +8,7 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from utils.data_loader import cargar_datos, get_restaurante_color
+from utils.metrics import COLUMNAS_CUBO, consultar_linea_base, filtrar_cubo, get_cubo_ventas, get_linea_base_semanal, posiciones_top_k
 
 st.set_page_config(page_title="Vista Diaria", page_icon="📍", layout="wide")
 
@@ -15,12 +16,15 @@ st.set_page_config(page_title="Vista Diaria", page_icon="📍", layout="wide")
 # CARGAR DATOS
 # ==========================================
 
-df = cargar_datos()
+df = cargar_datos(columnas=COLUMNAS_CUBO)
 
 if df is None:
     st.error("❌ Error cargando datos")
     st.stop()
 
+# Agregados de esta versión de los datos (se construyen una vez)
+cubo = get_cubo_ventas(df)
+
 # ==========================================
 # HEADER Y FILTROS
 # ==========================================
@@ -31,8 +35,8 @@ st.markdown("---")
 col1, col2, col3 = st.columns([2, 2, 1])
 
 with col1:
-    fecha_min = df['fecha'].min().date()
-    fecha_max = df['fecha'].max().date()
+    fecha_min = cubo['diario']['fecha'].min().date()
+    fecha_max = cubo['diario']['fecha'].max().date()
     
     fecha_sel = st.date_input(
         "📅 Selecciona una fecha",
@@ -42,7 +46,7 @@ with col1:
     )
 
 with col2:
-    restaurantes = ['Todos'] + sorted(df['restaurante'].unique().tolist())
+    restaurantes = ['Todos'] + sorted(cubo['mensual']['restaurante'].unique().tolist())
     restaurante_sel = st.selectbox("🏪 Restaurante", restaurantes, index=0)
 
 with col3:
@@ -59,12 +63,12 @@ with col3:
 st.markdown("---")
 
 # FILTRAR DATOS
-if restaurante_sel == 'Todos':
-    df_dia = df[df['fecha'] == pd.to_datetime(fecha_sel)]
-else:
-    df_dia = df[(df['fecha'] == pd.to_datetime(fecha_sel)) & (df['restaurante'] == restaurante_sel)]
+restaurante_filtro = None if restaurante_sel == 'Todos' else restaurante_sel
 
-if len(df_dia) == 0:
+diario_dia = filtrar_cubo(cubo, 'diario', fecha=pd.to_datetime(fecha_sel), restaurante=restaurante_filtro)
+productos_dia_cubo = filtrar_cubo(cubo, 'diario_producto', fecha=pd.to_datetime(fecha_sel), restaurante=restaurante_filtro)
+
+if len(diario_dia) == 0:
     st.warning(f"No hay datos para {restaurante_sel} en {fecha_sel}")
     st.stop()
 
@@ -80,22 +84,20 @@ dia_semana_esp = {
 dia_nombre = pd.to_datetime(fecha_sel).day_name()
 st.subheader(f"📅 {dia_semana_esp[dia_nombre]}, {fecha_sel.strftime('%d de %B de %Y')}")
 
-if df_dia['tiene_evento'].max() == 1:
+if diario_dia['tiene_evento'].max() == 1:
     st.success("🎉 **Día con evento especial**")
 
 # KPIs del día
-ventas_dia = df_dia['venta_pesos'].sum()
-unidades_dia = df_dia['cantidad_vendida_diaria'].sum()
-productos_dia = df_dia['producto'].nunique()
-ticket_prom = ventas_dia / len(df_dia) if len(df_dia) > 0 else 0
+ventas_dia = diario_dia['venta_pesos'].sum()
+unidades_dia = diario_dia['cantidad_vendida_diaria'].sum()
+productos_dia = productos_dia_cubo['producto'].nunique()
+filas_dia = diario_dia['filas'].sum()
+ticket_prom = ventas_dia / filas_dia if filas_dia > 0 else 0
 
 # Comparar con días similares
-if restaurante_sel == 'Todos':
-    df_dias_similares = df[df['dia_semana'] == dia_nombre]
-else:
-    df_dias_similares = df[(df['dia_semana'] == dia_nombre) & (df['restaurante'] == restaurante_sel)]
+dias_similares = consultar_linea_base(get_linea_base_semanal(df), dia_nombre, restaurante_filtro)
 
-ventas_promedio_similar = df_dias_similares.groupby('fecha')['venta_pesos'].sum().mean()
+ventas_promedio_similar = dias_similares['media']
 vs_promedio = ((ventas_dia - ventas_promedio_similar) / ventas_promedio_similar * 100) if ventas_promedio_similar > 0 else 0
 
 col1, col2, col3, col4 = st.columns(4)
@@ -137,7 +139,7 @@ st.markdown("---")
 if restaurante_sel == 'Todos':
     st.header("🏪 Ventas por Restaurante")
     
-    ventas_rest = df_dia.groupby('restaurante')['venta_pesos'].sum().sort_values(ascending=False)
+    ventas_rest = diario_dia.groupby('restaurante', observed=True)['venta_pesos'].sum().sort_values(ascending=False)
     
     col1, col2 = st.columns([2, 1])
     
@@ -188,17 +190,17 @@ if restaurante_sel == 'Todos':
 
 st.header("📋 Productos Vendidos")
 
-productos_dia_data = df_dia.groupby('producto').agg({
+productos_dia_data = productos_dia_cubo.groupby('producto', observed=True).agg({
     'cantidad_vendida_diaria': 'sum',
     'venta_pesos': 'sum'
-}).sort_values('venta_pesos', ascending=False)
+})
 
 col1, col2 = st.columns(2)
 
 with col1:
     st.subheader("🏆 Top 5 por Ventas")
     
-    top_5_ventas = productos_dia_data.head(5)
+    top_5_ventas = productos_dia_data.iloc[posiciones_top_k(productos_dia_data['venta_pesos'], 5)]
     
     for i, (producto, row) in enumerate(top_5_ventas.iterrows(), 1):
         st.markdown(f"""
@@ -213,7 +215,9 @@ with col1:
 with col2:
     st.subheader("📦 Top 5 por Cantidad")
     
-    top_5_cantidad = productos_dia_data.sort_values('cantidad_vendida_diaria', ascending=False).head(5)
+    top_5_cantidad = productos_dia_data.iloc[posiciones_top_k(
+        productos_dia_data['cantidad_vendida_diaria'], 5, desempate=productos_dia_data['venta_pesos']
+    )]
     
     for i, (producto, row) in enumerate(top_5_cantidad.iterrows(), 1):
         st.markdown(f"""
@@ -233,7 +237,7 @@ st.markdown("---")
 
 st.header("📊 Comparación con Días Similares")
 
-ventas_mismo_dia = df_dias_similares.groupby('fecha')['venta_pesos'].sum().sort_index().tail(5)
+ventas_mismo_dia = dias_similares['ultimos']
 
 fig = go.Figure()
 
@@ -9,7 +9,7 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from utils.data_loader import cargar_datos, get_restaurante_color
-from utils.metrics import calcular_top_productos
+from utils.metrics import COLUMNAS_CUBO, filtrar_cubo, get_cubo_ventas, posiciones_top_k, resumir_productos
 
 st.set_page_config(page_title="Productos Estrella", page_icon="⭐", layout="wide")
 
@@ -58,12 +58,15 @@ st.markdown("""
 # CARGAR DATOS
 # ==========================================
 
-df = cargar_datos()
+df = cargar_datos(columnas=COLUMNAS_CUBO)
 
 if df is None:
     st.error("❌ Error cargando datos")
     st.stop()
 
+# Agregados de esta versión de los datos (se construyen una vez)
+cubo = get_cubo_ventas(df)
+
 # ==========================================
 # HEADER Y FILTROS
 # ==========================================
@@ -75,11 +78,11 @@ st.markdown("---")
 col1, col2, col3 = st.columns([2, 2, 1])
 
 with col1:
-    años = ['Todos'] + sorted(df['año'].unique().tolist(), reverse=True)
+    años = ['Todos'] + sorted(cubo['mensual']['año'].unique().tolist(), reverse=True)
     año_sel = st.selectbox("📅 Año", años, index=0)
 
 with col2:
-    restaurantes = ['Todos'] + sorted(df['restaurante'].unique().tolist())
+    restaurantes = ['Todos'] + sorted(cubo['mensual']['restaurante'].unique().tolist())
     restaurante_sel = st.selectbox("🏪 Restaurante", restaurantes, index=0)
 
 with col3:
@@ -88,18 +91,20 @@ with col3:
 st.markdown("---")
 
 # FILTRAR DATOS
-df_filtrado = df.copy()
+filtros = {
+    'año': None if año_sel == 'Todos' else int(año_sel),
+    'restaurante': None if restaurante_sel == 'Todos' else restaurante_sel
+}
 
-if año_sel != 'Todos':
-    df_filtrado = df_filtrado[df_filtrado['año'] == int(año_sel)]
+ventas_diarias = filtrar_cubo(cubo, 'diario', **filtros)
+ventas_productos = filtrar_cubo(cubo, 'diario_producto', **filtros)
 
 if restaurante_sel != 'Todos':
-    df_filtrado = df_filtrado[df_filtrado['restaurante'] == restaurante_sel]
     color_principal = get_restaurante_color(restaurante_sel)
 else:
     color_principal = '#FFD93D'
 
-if len(df_filtrado) == 0:
+if len(ventas_diarias) == 0:
     st.warning("No hay datos para los filtros seleccionados")
     st.stop()
 
@@ -107,12 +112,10 @@ if len(df_filtrado) == 0:
 # CALCULAR MÉTRICAS DE PRODUCTOS
 # ==========================================
 
-# Agrupar por producto
-productos_metricas = df_filtrado.groupby('producto').agg({
-    'venta_pesos': ['sum', 'mean', 'std'],
-    'cantidad_vendida_diaria': ['sum', 'mean'],
-    'fecha': 'count'
-}).reset_index()
+# Agrupar por producto (desde las celdas del cubo)
+productos_metricas = resumir_productos(ventas_productos)[[
+    'venta_pesos', 'venta_promedio', 'venta_std', 'cantidad_vendida_diaria', 'cantidad_promedio', 'filas'
+]].reset_index()
 
 productos_metricas.columns = ['producto', 'ventas_totales', 'venta_promedio', 'venta_std', 
                                'unidades_totales', 'unidad_promedio', 'dias_venta']
@@ -120,7 +123,7 @@ productos_metricas.columns = ['producto', 'ventas_totales', 'venta_promedio', 'v
 # Calcular métricas adicionales
 productos_metricas['ticket_promedio'] = productos_metricas['ventas_totales'] / productos_metricas['unidades_totales']
 productos_metricas['consistencia'] = 1 / (1 + productos_metricas['venta_std'])
-productos_metricas['frecuencia'] = productos_metricas['dias_venta'] / df_filtrado['fecha'].nunique()
+productos_metricas['frecuencia'] = productos_metricas['dias_venta'] / ventas_diarias['fecha'].nunique()
 
 # Score compuesto (ventas + consistencia + frecuencia)
 productos_metricas['score'] = (
@@ -130,7 +133,7 @@ productos_metricas['score'] = (
 )
 
 # Top N productos
-top_productos = productos_metricas.nlargest(top_n, 'score')
+top_productos = productos_metricas.iloc[posiciones_top_k(productos_metricas['score'], top_n)]
 
 # ==========================================
 # RESUMEN EJECUTIVO
@@ -150,7 +153,7 @@ with col1:
     """, unsafe_allow_html=True)
 
 with col2:
-    participacion = (ventas_top / df_filtrado['venta_pesos'].sum()) * 100
+    participacion = (ventas_top / ventas_diarias['venta_pesos'].sum()) * 100
     st.markdown(f"""
     <div class='star-card' style='background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%);'>
         <div class='star-label'>📈 % del Total</div>
@@ -260,7 +263,7 @@ st.header("🔍 Análisis Detallado - Top 5")
 for idx, (_, producto) in enumerate(top_productos.head(5).iterrows(), 1):
     
     # Datos del producto
-    df_producto = df_filtrado[df_filtrado['producto'] == producto['producto']]
+    df_producto = ventas_productos[ventas_productos['producto'] == producto['producto']]
     
     with st.expander(f"{'🥇' if idx == 1 else '🥈' if idx == 2 else '🥉' if idx == 3 else '⭐'} #{idx} - {producto['producto']}", expanded=(idx <= 2)):
         
@@ -330,7 +333,7 @@ for idx, (_, producto) in enumerate(top_productos.head(5).iterrows(), 1):
         col1, col2 = st.columns(2)
         
         with col1:
-            ventas_dia_semana = df_producto.groupby('dia_semana')['venta_pesos'].sum()
+            ventas_dia_semana = df_producto.groupby('dia_semana', observed=True)['venta_pesos'].sum()
             dias_orden = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
             ventas_dia_semana = ventas_dia_semana.reindex(dias_orden, fill_value=0)
             
@@ -354,7 +357,7 @@ for idx, (_, producto) in enumerate(top_productos.head(5).iterrows(), 1):
         with col2:
             # Por restaurante (si aplica)
             if restaurante_sel == 'Todos':
-                ventas_rest = df_producto.groupby('restaurante')['venta_pesos'].sum()
+                ventas_rest = df_producto.groupby('restaurante', observed=True)['venta_pesos'].sum()
                 
                 fig = px.pie(
                     values=ventas_rest.values,
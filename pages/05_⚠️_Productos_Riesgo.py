@@ -1,15 +1,14 @@
 # pages/05_⚠️_Productos_Riesgo.py
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
-from scipy import stats
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from utils.data_loader import cargar_datos, get_restaurante_color
+from utils.metrics import COLUMNAS_CUBO, consultar_riesgo, filtrar_cubo, get_cubo_ventas, get_tabla_riesgo
 
 st.set_page_config(page_title="Productos Riesgo", page_icon="⚠️", layout="wide")
 
@@ -50,12 +49,15 @@ st.markdown("""
 # CARGAR DATOS
 # ==========================================
 
-df = cargar_datos()
+df = cargar_datos(columnas=COLUMNAS_CUBO)
 
 if df is None:
     st.error("❌ Error cargando datos")
     st.stop()
 
+# Agregados de esta versión de los datos (se construyen una vez)
+cubo = get_cubo_ventas(df)
+
 # ==========================================
 # HEADER Y FILTROS
 # ==========================================
@@ -67,11 +69,11 @@ st.markdown("---")
 col1, col2, col3 = st.columns([2, 2, 1])
 
 with col1:
-    años = ['Todos'] + sorted(df['año'].unique().tolist(), reverse=True)
+    años = ['Todos'] + sorted(cubo['mensual']['año'].unique().tolist(), reverse=True)
     año_sel = st.selectbox("📅 Año", años, index=0)
 
 with col2:
-    restaurantes = ['Todos'] + sorted(df['restaurante'].unique().tolist())
+    restaurantes = ['Todos'] + sorted(cubo['mensual']['restaurante'].unique().tolist())
     restaurante_sel = st.selectbox("🏪 Restaurante", restaurantes, index=0)
 
 with col3:
@@ -80,122 +82,23 @@ with col3:
 st.markdown("---")
 
 # FILTRAR DATOS
-df_filtrado = df.copy()
-
-if año_sel != 'Todos':
-    df_filtrado = df_filtrado[df_filtrado['año'] == int(año_sel)]
+filtros = {
+    'año': None if año_sel == 'Todos' else int(año_sel),
+    'restaurante': None if restaurante_sel == 'Todos' else restaurante_sel
+}
 
-if restaurante_sel != 'Todos':
-    df_filtrado = df_filtrado[df_filtrado['restaurante'] == restaurante_sel]
+df_filtrado = filtrar_cubo(cubo, 'diario_producto', **filtros)
 
 if len(df_filtrado) == 0:
     st.warning("No hay datos para los filtros seleccionados")
     st.stop()
 
-# Obtener últimos N días
-fecha_max = df_filtrado['fecha'].max()
-fecha_min_reciente = fecha_max - pd.Timedelta(days=umbral_dias)
-df_reciente = df_filtrado[df_filtrado['fecha'] >= fecha_min_reciente]
-
 # ==========================================
-# CALCULAR INDICADORES DE RIESGO
+# INDICADORES DE RIESGO (PRECALCULADOS)
 # ==========================================
 
-productos_riesgo = []
-
-for producto in df_filtrado['producto'].unique():
-    df_prod = df_filtrado[df_filtrado['producto'] == producto]
-    df_prod_reciente = df_reciente[df_reciente['producto'] == producto]
-    
-    # Métricas básicas
-    ventas_total = df_prod['venta_pesos'].sum()
-    ventas_recientes = df_prod_reciente['venta_pesos'].sum()
-    dias_total = len(df_prod)
-    dias_recientes = len(df_prod_reciente)
-    
-    if dias_total < 10:  # Muy poco histórico
-        continue
-    
-    # 1. TENDENCIA (regresión lineal)
-    ventas_diarias = df_prod.groupby('fecha')['venta_pesos'].sum().reset_index()
-    if len(ventas_diarias) >= 5:
-        x = np.arange(len(ventas_diarias))
-        y = ventas_diarias['venta_pesos'].values
-        slope, intercept, r_value, p_value, std_err = stats.linregress(x, y)
-        tendencia = slope
-        r_squared = r_value ** 2
-    else:
-        tendencia = 0
-        r_squared = 0
-    
-    # 2. VENTAS RECIENTES VS HISTÓRICO
-    venta_prom_historico = ventas_total / dias_total
-    venta_prom_reciente = ventas_recientes / max(dias_recientes, 1)
-    caida_reciente = ((venta_prom_historico - venta_prom_reciente) / venta_prom_historico) * 100 if venta_prom_historico > 0 else 0
-    
-    # 3. VARIABILIDAD
-    std_ventas = df_prod.groupby('fecha')['venta_pesos'].sum().std()
-    mean_ventas = df_prod.groupby('fecha')['venta_pesos'].sum().mean()
-    cv = (std_ventas / mean_ventas) * 100 if mean_ventas > 0 else 0
-    
-    # 4. FRECUENCIA DE VENTA
-    dias_unicos_venta = df_prod['fecha'].nunique()
-    dias_disponibles = df_filtrado['fecha'].nunique()
-    frecuencia = (dias_unicos_venta / dias_disponibles) * 100
-    
-    # 5. DÍAS SIN VENTA (en período reciente)
-    dias_sin_venta = umbral_dias - dias_recientes
-    
-    # CALCULAR SCORE DE RIESGO (0-100, mayor = más riesgo)
-    score_riesgo = 0
-    
-    # Tendencia negativa (0-30 puntos)
-    if tendencia < 0:
-        score_riesgo += min(abs(tendencia) / 10000, 30)
-    
-    # Caída reciente (0-25 puntos)
-    if caida_reciente > 0:
-        score_riesgo += min(caida_reciente / 4, 25)
-    
-    # Alta variabilidad (0-20 puntos)
-    if cv > 50:
-        score_riesgo += min((cv - 50) / 5, 20)
-    
-    # Baja frecuencia (0-15 puntos)
-    if frecuencia < 50:
-        score_riesgo += min((50 - frecuencia) / 3.33, 15)
-    
-    # Días sin venta recientes (0-10 puntos)
-    if dias_sin_venta > 0:
-        score_riesgo += min(dias_sin_venta / 3, 10)
-    
-    productos_riesgo.append({
-        'producto': producto,
-        'ventas_total': ventas_total,
-        'ventas_recientes': ventas_recientes,
-        'venta_prom_historico': venta_prom_historico,
-        'venta_prom_reciente': venta_prom_reciente,
-        'caida_reciente_%': caida_reciente,
-        'tendencia': tendencia,
-        'r_squared': r_squared,
-        'cv_%': cv,
-        'frecuencia_%': frecuencia,
-        'dias_sin_venta': dias_sin_venta,
-        'score_riesgo': score_riesgo
-    })
-
-df_riesgo = pd.DataFrame(productos_riesgo).sort_values('score_riesgo', ascending=False)
-
-# Clasificar nivel de riesgo
-def clasificar_riesgo(score):
-    if score >= 60:
-        return 'Alto'
-    elif score >= 30:
-        return 'Medio'
-    else:
-        return 'Bajo'
-
-df_riesgo['nivel_riesgo'] = df_riesgo['score_riesgo'].apply(clasificar_riesgo)
+# Score de todos los años × restaurantes × umbrales, calculado una vez por versión de los datos
+df_riesgo = consultar_riesgo(get_tabla_riesgo(df), umbral_dias=umbral_dias, **filtros)
 
 # ==========================================
 # RESUMEN DE RIESGOS
@@ -14,7 +14,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from utils.data_loader import cargar_datos
-from utils.feature_engineering import create_all_features, get_feature_columns
+from utils.feature_engineering import create_feature_matrix, get_feature_columns
+from utils.feature_store import get_features_serie
 from utils.model_trainer import XGBoostPredictor, calculate_metrics, generate_alerts
 
 # ==========================================
@@ -73,12 +74,7 @@ st.markdown("""
 # CARGAR DATOS
 # ==========================================
 
-@st.cache_data
-def load_data():
-    """Cargar datos consolidados"""
-    return cargar_datos()
-
-df_all = load_data()
+df_all = cargar_datos()
 
 if df_all is None:
     st.error("❌ No se pudieron cargar los datos")
@@ -258,8 +254,8 @@ if entrenar:
             # Mostrar info inicial
             st.info(f"📊 **Datos originales:** {len(df_producto)} días")
             
-            # Crear features
-            df_features = create_all_features(df_producto)
+            # Crear features (o reutilizarlas si los datos del producto no cambiaron)
+            df_features = get_features_serie(df_producto, restaurante)
             
             st.info(f"📊 **Después de crear features:** {len(df_features)} días")
             
@@ -406,18 +402,11 @@ if entrenar:
                 'cantidad_vendida_diaria': df_producto['cantidad_vendida_diaria'].tail(30).mean()
             })
             
-            # Aplicar feature engineering
-            df_future = create_all_features(df_future)
-            
-            # Asegurar que tenga todas las features
-            for col in feature_cols:
-                if col not in df_future.columns:
-                    df_future[col] = 0
+            # Aplicar feature engineering (las features con que se entrenó el modelo, en float32 como al entrenar)
+            matriz_future, _ = create_feature_matrix(df_future, columnas=predictor.feature_names)
             
             # Rellenar NaN
-            df_future = df_future.fillna(method='ffill').fillna(method='bfill').fillna(0)
-            
-            X_future = df_future[feature_cols].fillna(0)
+            X_future = pd.DataFrame(matriz_future, columns=predictor.feature_names).ffill().bfill().fillna(0)
             
             progress_bar.progress(85)
             
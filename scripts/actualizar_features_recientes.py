@@ -0,0 +1,66 @@
+# scripts/actualizar_features_recientes.py
+"""
+Actualización incremental de features (noche o durante el día)
+
+Uso: python scripts/actualizar_features_recientes.py [checkpoint] [salida]
+
+La primera vez arma el estado de StreamingFeatures desde el histórico y
+lo guarda en `checkpoint` (por defecto data/cache/features_streaming.pkl).
+Las siguientes carga ese estado, registra solo los días nuevos de cada
+serie y escribe sus features como Arrow IPC en `salida` (por defecto
+data/cache/features_recientes.arrow), sin recalcular la historia.
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.data_loader import CACHE_PATH, cargar_datos
+from utils.feature_streaming import StreamingFeatures
+
+POR = ['restaurante', 'descripcion_producto']
+TARGET = 'cantidad_vendida_diaria'
+
+CHECKPOINT = CACHE_PATH / "features_streaming.pkl"
+SALIDA = CACHE_PATH / "features_recientes.arrow"
+
+
+def actualizar(df, checkpoint=CHECKPOINT, salida=SALIDA):
+    """Registra los días nuevos de df y guarda sus features; devuelve cuántas filas eran nuevas (None = estado inicial)"""
+    checkpoint, salida = Path(checkpoint), Path(salida)
+    
+    if not checkpoint.exists():
+        StreamingFeatures.from_history(df, TARGET, POR).save(checkpoint)
+        return None
+    
+    motor = StreamingFeatures.load(checkpoint)
+    nuevas = motor.pendientes(df)
+    matriz, columnas = motor.update(nuevas)
+    
+    features = pd.DataFrame(matriz, columns=list(columnas))
+    for col in reversed(POR + ['fecha']):
+        features.insert(0, col, nuevas[col].to_numpy())
+    
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    features.to_feather(salida)
+    motor.save(checkpoint)
+    
+    return len(nuevas)
+
+
+if __name__ == '__main__':
+    checkpoint = Path(sys.argv[1]) if len(sys.argv) > 1 else CHECKPOINT
+    salida = Path(sys.argv[2]) if len(sys.argv) > 2 else SALIDA
+    
+    df = cargar_datos(columnas=['fecha'] + POR + [TARGET])
+    if df is None:
+        sys.exit("No hay CSV de ventas en data/")
+    
+    filas = actualizar(df, checkpoint, salida)
+    if filas is None:
+        print(f"Estado inicial guardado en {checkpoint}")
+    else:
+        print(f"{filas} filas nuevas con features en {salida}")
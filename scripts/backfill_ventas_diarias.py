@@ -0,0 +1,44 @@
+# scripts/backfill_ventas_diarias.py
+"""
+Backfill de ventas diarias por restaurante × producto
+
+Uso: python scripts/backfill_ventas_diarias.py [salida] [tamaño_bloque]
+
+Lee los CSV de data/ por bloques con cargar_agregados_por_bloques (la
+memoria pico depende del tamaño de bloque, no del histórico) y escribe los
+agregados como Arrow IPC en `salida` (por defecto
+data/cache/ventas_diarias.arrow).
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.data_loader import CACHE_PATH, cargar_agregados_por_bloques
+
+SALIDA = CACHE_PATH / "ventas_diarias.arrow"
+
+
+def backfill(salida=SALIDA, tamaño_bloque=200_000):
+    """Agregados diarios de todo el histórico escritos en `salida`; devuelve el número de filas"""
+    agregado = cargar_agregados_por_bloques(tamaño_bloque)
+    if agregado is None:
+        return None
+    
+    salida = Path(salida)
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    agregado.to_feather(salida)
+    
+    return len(agregado)
+
+
+if __name__ == '__main__':
+    salida = Path(sys.argv[1]) if len(sys.argv) > 1 else SALIDA
+    tamaño_bloque = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    
+    filas = backfill(salida, tamaño_bloque)
+    if filas is None:
+        sys.exit("No hay CSV de ventas en data/")
+    
+    print(f"{filas} filas diarias en {salida}")
@@ -0,0 +1,92 @@
+# scripts/benchmark_motores.py
+"""
+Benchmark de los motores de métricas (pandas, Polars, DuckDB)
+
+Uso: python scripts/benchmark_motores.py [factor] [motor ...]
+
+Escala los datos de cargar_datos `factor` veces (restaurantes renombrados,
+mismo calendario) y mide cada motor calculando las métricas de todos los
+años, algunos meses y días, el top de productos y los productos en riesgo.
+El DataFrame escalado no viene de cargar_datos, así que ningún motor usa
+caché: cada llamada calcula desde el DataFrame que recibe. En pandas eso
+es el cálculo directo de cada año, mes o día (sin cubo ni tablas por
+lotes), la referencia contra la que se comparan los demás motores.
+"""
+
+import importlib
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.data_loader import cargar_datos
+from utils.metrics import COLUMNAS_CUBO
+
+MOTORES = {
+    'pandas': 'utils.metrics',
+    'polars': 'utils.metrics_polars',
+    'duckdb': 'utils.metrics_sql'
+}
+
+
+def escalar_datos(df, factor):
+    """`factor` copias de df con restaurantes renombrados (mismo calendario, más filas)"""
+    copias = [df.assign(restaurante=df['restaurante'].astype(str) + f' {i}') for i in range(factor)]
+    return pd.concat(copias, ignore_index=True).sort_values('fecha', kind='stable', ignore_index=True)
+
+
+def comparar_motores(df, factor=10, motores=('pandas', 'polars'), repeticiones=3, muestras=3):
+    """Mejor tiempo de `repeticiones` pasadas por motor sobre df escalado `factor` veces
+    
+    Cada pasada calcula métricas de todos los años, `muestras` meses y
+    `muestras` días repartidos en el histórico, el top de productos y los
+    productos en riesgo. `vs_pandas` es el tiempo relativo al cálculo
+    directo de pandas.
+    """
+    escalado = escalar_datos(df, factor)
+    
+    meses = escalado[['año', 'mes']].drop_duplicates().sort_values(['año', 'mes'])
+    meses = [(int(año), int(mes)) for año, mes in meses.itertuples(index=False)]
+    años = sorted({año for año, _ in meses})
+    meses = [meses[i] for i in np.linspace(0, len(meses) - 1, min(muestras, len(meses))).astype(int)]
+    fechas = np.sort(escalado['fecha'].unique())
+    fechas = fechas[np.linspace(0, len(fechas) - 1, min(muestras, len(fechas))).astype(int)]
+    
+    def pasada(motor):
+        inicio = time.perf_counter()
+        for año in años:
+            motor.calcular_metricas_anuales(escalado, año)
+        for año, mes in meses:
+            motor.calcular_metricas_mensuales(escalado, año, mes)
+        for fecha in fechas:
+            motor.calcular_metricas_diarias(escalado, fecha)
+        motor.calcular_top_productos(escalado)
+        motor.calcular_productos_riesgo(escalado)
+        return time.perf_counter() - inicio
+    
+    resultados = []
+    for nombre in motores:
+        motor = importlib.import_module(MOTORES[nombre])
+        tiempo = min(pasada(motor) for _ in range(repeticiones))
+        resultados.append({'motor': nombre, 'filas': len(escalado), 'segundos': tiempo})
+    
+    resultados = pd.DataFrame(resultados)
+    if 'pandas' in motores:
+        resultados['vs_pandas'] = resultados['segundos'] / resultados.loc[resultados['motor'] == 'pandas', 'segundos'].iloc[0]
+    
+    return resultados
+
+
+if __name__ == '__main__':
+    factor = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    motores = sys.argv[2:] or ['pandas', 'polars']
+    
+    df = cargar_datos(columnas=COLUMNAS_CUBO)
+    if df is None:
+        sys.exit("No hay CSV de ventas en data/")
+    
+    print(comparar_motores(df, factor, motores).to_string(index=False))
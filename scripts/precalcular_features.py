@@ -0,0 +1,32 @@
+# scripts/precalcular_features.py
+"""
+Precalcula las features de todo el catálogo (restaurante × producto)
+
+Uso: python scripts/precalcular_features.py
+
+Pensado para correr de noche: get_features_panel lee del almacén las
+series cuyos datos no cambiaron y calcula juntas las demás con
+create_panel_features, así que al entrenar el Predictor las features de
+cualquier producto ya están guardadas.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.data_loader import cargar_datos
+from utils.feature_store import get_features_panel
+
+COLUMNAS = ['fecha', 'restaurante', 'codigo_producto', 'descripcion_producto', 'cantidad_vendida_diaria']
+
+
+if __name__ == '__main__':
+    df = cargar_datos(columnas=COLUMNAS)
+    if df is None:
+        sys.exit("No hay CSV de ventas en data/")
+    
+    inicio = time.perf_counter()
+    features = get_features_panel(df)
+    print(f"{len(features)} series con features en {time.perf_counter() - inicio:.1f} s")
@@ -0,0 +1,20 @@
+# tests/conftest.py
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+
+@pytest.fixture(scope='session')
+def datos():
+    """Columnas del cubo cargadas con cargar_datos desde los CSV de data/"""
+    from utils.data_loader import cargar_datos
+    from utils.metrics import COLUMNAS_CUBO
+    
+    df = cargar_datos(columnas=COLUMNAS_CUBO)
+    if df is None:
+        pytest.skip("No hay CSV de ventas en data/")
+    
+    return df
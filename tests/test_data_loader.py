@@ -0,0 +1,28 @@
+# tests/test_data_loader.py
+"""
+La carga por bloques da los mismos agregados diarios que cargar_datos()
+"""
+
+import pandas as pd
+
+from utils.data_loader import agregar_ventas_diarias, cargar_agregados_por_bloques
+
+
+def test_bloques_iguales_a_cargar_datos(datos):
+    # Bloques chicos: varios por archivo y al menos una compactación de parciales
+    por_bloques = cargar_agregados_por_bloques(tamaño_bloque=3000)
+    
+    pd.testing.assert_frame_equal(por_bloques, agregar_ventas_diarias(datos))
+
+
+def test_snapshot_respeta_temporales_ajenos(datos, tmp_path, monkeypatch):
+    from utils import data_loader
+    
+    monkeypatch.setattr(data_loader, 'CACHE_PATH', tmp_path)
+    ajeno = tmp_path / 'snapshot_otro.x1y2z3.tmp'
+    ajeno.write_bytes(b'')
+    (tmp_path / 'snapshot_viejo.arrow').write_bytes(b'')
+    
+    data_loader._guardar_snapshot(datos.head(100), 'nuevo')
+    
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['snapshot_nuevo.arrow', 'snapshot_otro.x1y2z3.tmp']
@@ -0,0 +1,62 @@
+# tests/test_feature_store.py
+"""
+El almacén de features devuelve lo mismo que calcularlas, y corregir un
+día viejo de una serie invalida su entrada
+"""
+
+import numpy as np
+import pytest
+
+from utils import feature_store
+from utils.data_loader import cargar_datos
+from utils.feature_engineering import create_all_features, get_feature_columns
+
+pytest.importorskip('pyarrow')
+
+POR = ['restaurante', 'descripcion_producto']
+
+
+@pytest.fixture(scope='module')
+def ventas():
+    df = cargar_datos(columnas=['fecha', 'codigo_producto'] + POR + ['cantidad_vendida_diaria'])
+    if df is None:
+        pytest.skip("No hay CSV de ventas en data/")
+    return df
+
+
+@pytest.fixture
+def almacen(tmp_path, monkeypatch):
+    monkeypatch.setattr(feature_store, 'FEATURES_PATH', tmp_path)
+    return tmp_path
+
+
+def _serie(ventas):
+    restaurante, descripcion = ventas[POR].dropna().iloc[0]
+    serie = ventas[(ventas['restaurante'] == restaurante) & (ventas['descripcion_producto'] == descripcion)]
+    return serie.sort_values('fecha', kind='stable').reset_index(drop=True), restaurante
+
+
+def _mismas_features(guardadas, calculadas):
+    columnas = get_feature_columns()
+    np.testing.assert_array_equal(guardadas[columnas].to_numpy(), calculadas[columnas].to_numpy(dtype=np.float32))
+
+
+def test_corregir_un_dia_viejo_invalida_la_entrada(ventas, almacen):
+    serie, restaurante = _serie(ventas)
+    feature_store.get_features_serie(serie, restaurante)
+    
+    corregida = serie.copy()
+    corregida.loc[0, 'cantidad_vendida_diaria'] += 1
+    
+    assert feature_store.clave_serie(corregida, restaurante) != feature_store.clave_serie(serie, restaurante)
+    _mismas_features(feature_store.get_features_serie(corregida, restaurante), create_all_features(corregida))
+
+
+def test_panel_comparte_entradas_con_cada_serie(ventas, almacen):
+    serie, restaurante = _serie(ventas)
+    panel = feature_store.get_features_panel(ventas)
+    
+    clave = feature_store.clave_serie(serie, restaurante)
+    assert clave in panel
+    assert feature_store.leer_features([clave])[clave] is not None
+    _mismas_features(panel[clave], create_all_features(serie))
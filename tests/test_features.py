@@ -0,0 +1,111 @@
+# tests/test_features.py
+"""
+Las cuatro formas de crear features dan los mismos valores
+
+create_all_features por serie, create_panel_features, create_feature_matrix
+y StreamingFeatures, sobre las series restaurante × producto de data/.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.data_loader import cargar_datos
+from utils.feature_engineering import create_all_features, create_feature_matrix, create_panel_features, get_feature_columns
+from utils.feature_streaming import StreamingFeatures
+
+POR = ['restaurante', 'descripcion_producto']
+
+
+@pytest.fixture(scope='module')
+def ventas():
+    df = cargar_datos(columnas=['fecha'] + POR + ['cantidad_vendida_diaria'])
+    if df is None:
+        pytest.skip("No hay CSV de ventas en data/")
+    return df.assign(fila=np.arange(len(df)))
+
+
+def test_panel_igual_a_cada_serie(ventas):
+    panel = create_panel_features(ventas, por=POR)
+    
+    partes = [
+        create_all_features(serie.sort_values('fecha', kind='stable'))
+        for _, serie in ventas.groupby(POR, sort=False, dropna=False, observed=True)
+    ]
+    por_serie = pd.concat(partes, ignore_index=True)
+    
+    columnas = get_feature_columns()
+    assert panel['fila'].tolist() == por_serie['fila'].tolist()
+    np.testing.assert_allclose(
+        panel[columnas].to_numpy(dtype=float), por_serie[columnas].to_numpy(dtype=float), rtol=1e-9, atol=1e-9
+    )
+
+
+def test_matriz_igual_al_panel(ventas):
+    matriz, columnas = create_feature_matrix(ventas, por=POR)
+    panel = create_panel_features(ventas, por=POR)
+    
+    assert list(columnas) == get_feature_columns()
+    np.testing.assert_allclose(
+        matriz[panel['fila'].to_numpy()], panel[list(columnas)].to_numpy(dtype=np.float32), rtol=1e-6
+    )
+
+
+def test_matriz_con_columnas_elegidas(ventas):
+    completa, columnas = create_feature_matrix(ventas, por=POR)
+    elegidas = ['rolling_std_14', 'mes', 'diff_7', 'es_navidad']
+    
+    matriz, posiciones = create_feature_matrix(ventas, por=POR, columnas=elegidas)
+    
+    assert list(posiciones) == elegidas
+    np.testing.assert_array_equal(matriz, completa[:, [columnas[nombre] for nombre in elegidas]])
+
+
+def test_streaming_igual_a_la_matriz(ventas, tmp_path):
+    matriz, columnas = create_feature_matrix(ventas, por=POR)
+    
+    corte = np.sort(ventas['fecha'].unique())[-10]
+    historia = ventas[ventas['fecha'] < corte]
+    nuevos = ventas[ventas['fecha'] >= corte].sort_values('fecha', kind='stable')
+    
+    motor = StreamingFeatures.from_history(historia)
+    motor.save(tmp_path / 'estado.pkl')
+    motor = StreamingFeatures.load(tmp_path / 'estado.pkl')
+    
+    obtenida, columnas_streaming = motor.update(nuevos)
+    
+    assert columnas_streaming == columnas
+    np.testing.assert_allclose(obtenida, matriz[nuevos['fila'].to_numpy()], rtol=1e-5, atol=1e-5)
+
+
+def test_streaming_rechaza_dias_repetidos(ventas, tmp_path, monkeypatch):
+    ultimo = ventas['fecha'].max()
+    motor = StreamingFeatures.from_history(ventas)
+    posiciones = {clave: serie.posicion for clave, serie in motor.series.items()}
+    
+    with pytest.raises(ValueError):
+        motor.update(ventas[ventas['fecha'] == ultimo])
+    clave, serie = next(iter(motor.series.items()))
+    with pytest.raises(ValueError):
+        motor.append(clave, serie.ultima_fecha - pd.Timedelta(days=1), 1)
+    
+    assert {clave: serie.posicion for clave, serie in motor.series.items()} == posiciones
+    
+    # Checkpoint en el directorio actual (sin carpeta en la ruta)
+    monkeypatch.chdir(tmp_path)
+    motor.save('estado.pkl')
+    assert len(StreamingFeatures.load('estado.pkl').series) == len(motor.series)
+
+
+def test_streaming_pendientes(ventas):
+    matriz, columnas = create_feature_matrix(ventas, por=POR)
+    
+    corte = np.sort(ventas['fecha'].unique())[-10]
+    motor = StreamingFeatures.from_history(ventas[ventas['fecha'] < corte])
+    
+    nuevos = motor.pendientes(ventas)
+    obtenida, _ = motor.update(nuevos)
+    
+    assert (nuevos['fecha'] >= corte).all() and len(nuevos) == (ventas['fecha'] >= corte).sum()
+    np.testing.assert_allclose(obtenida, matriz[nuevos['fila'].to_numpy()], rtol=1e-5, atol=1e-5)
+    assert len(motor.pendientes(ventas)) == 0
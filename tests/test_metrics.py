@@ -0,0 +1,101 @@
+# tests/test_metrics.py
+"""Estructuras cacheadas de utils.metrics: solo el DataFrame de cargar_datos comparte caché"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import metrics
+from utils.data_loader import clave_datos
+from utils.metrics import calcular_metricas_anuales, calcular_metricas_diarias, calcular_metricas_mensuales
+
+
+def test_clave_solo_para_el_dataframe_cargado(datos):
+    assert clave_datos(datos) is not None
+    assert clave_datos(datos.iloc[:1000]) is None
+    assert clave_datos(datos.copy(deep=False)) is None
+
+
+def test_rebanadas_del_mismo_tamaño(datos):
+    primera, segunda = datos.iloc[:1000], datos.iloc[1000:2000]
+    
+    assert calcular_metricas_diarias(primera, primera['fecha'].iloc[0]) is not None
+    
+    fecha = segunda['fecha'].iloc[0]
+    metricas = calcular_metricas_diarias(segunda, fecha)
+    assert metricas is not None
+    assert metricas['ventas_totales'] == pytest.approx(segunda.loc[segunda['fecha'] == fecha, 'venta_pesos'].sum())
+
+
+def test_metricas_anuales_de_un_subconjunto(datos):
+    abril = datos[datos['mes'] == 4]
+    año = int(abril['año'].iloc[0])
+    
+    calcular_metricas_anuales(datos, año)
+    metricas = calcular_metricas_anuales(abril, año)
+    
+    assert metricas['ventas_totales'] == pytest.approx(abril.loc[abril['año'] == año, 'venta_pesos'].sum())
+
+
+@pytest.fixture
+def sin_estructuras(monkeypatch):
+    """Falla si se construye el cubo o el índice de fechas (estructuras del dataset completo)"""
+    def falla(*args, **kwargs):
+        raise AssertionError("un DataFrame sin clave de caché no debe construir estructuras completas")
+    
+    for nombre in ('construir_cubo', 'construir_indice_fechas'):
+        monkeypatch.setattr(metrics, nombre, falla)
+
+
+def test_diarias_sin_clave_calculan_solo_el_dia(datos, sin_estructuras):
+    filtrado = datos[datos['venta_pesos'] > 0]
+    fecha = filtrado['fecha'].iloc[len(filtrado) // 2]
+    
+    metricas = calcular_metricas_diarias(filtrado, fecha)
+    
+    similares = filtrado[filtrado['dia_semana'] == fecha.day_name()]
+    media = similares.groupby('fecha', observed=True)['venta_pesos'].sum().mean()
+    ventas = filtrado.loc[filtrado['fecha'] == fecha, 'venta_pesos'].sum()
+    assert metricas['ventas_totales'] == pytest.approx(ventas)
+    assert metricas['vs_promedio_dia_similar'] == pytest.approx((ventas - media) / media * 100)
+
+
+def _mismas_metricas(cacheadas, directas):
+    assert cacheadas.keys() == directas.keys()
+    for clave, valor in cacheadas.items():
+        if isinstance(valor, pd.Series):
+            assert list(map(str, valor.index)) == list(map(str, directas[clave].index)), clave
+            np.testing.assert_allclose(valor.to_numpy(dtype=float), directas[clave].to_numpy(dtype=float), rtol=1e-9)
+        elif isinstance(valor, (float, np.floating)):
+            assert directas[clave] == pytest.approx(valor, rel=1e-9), clave
+        else:
+            assert str(directas[clave]) == str(valor), clave
+
+
+def test_mensuales_sin_clave_iguales_a_las_cacheadas(datos, request):
+    meses = [tuple(fila) for fila in datos[['año', 'mes']].drop_duplicates().itertuples(index=False)]
+    cacheadas = {mes: calcular_metricas_mensuales(datos, *mes) for mes in meses}
+    
+    request.getfixturevalue('sin_estructuras')
+    copia = datos.copy(deep=False)
+    for mes in meses:
+        _mismas_metricas(cacheadas[mes], calcular_metricas_mensuales(copia, *mes))
+
+
+def test_anuales_sin_clave_iguales_a_las_cacheadas(datos, request):
+    años = sorted(datos['año'].unique())
+    cacheadas = {año: calcular_metricas_anuales(datos, año) for año in años}
+    
+    request.getfixturevalue('sin_estructuras')
+    copia = datos.copy(deep=False)
+    for año in años:
+        _mismas_metricas(cacheadas[año], calcular_metricas_anuales(copia, año))
+
+
+def test_filtrar_cubo_mes_sin_año(datos):
+    cubo = metrics.get_cubo_ventas(datos)
+    
+    for nombre in ('diario', 'diario_producto', 'mensual'):
+        filtrada = metrics.filtrar_cubo(cubo, nombre, mes=4)
+        assert len(filtrada) == (cubo[nombre]['mes'] == 4).sum() > 0
+        assert set(filtrada['mes']) == {4}
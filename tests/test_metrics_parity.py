@@ -0,0 +1,100 @@
+# tests/test_metrics_parity.py
+"""
+Paridad de los motores opcionales (DuckDB, Polars) con utils.metrics
+
+Cada métrica de todos los años y meses, fechas repartidas en el histórico,
+el top de productos y los productos en riesgo deben coincidir con la
+versión pandas, tanto sobre el DataFrame de cargar_datos (estructuras
+cacheadas) como sobre un subconjunto filtrado (calculado sin caché).
+"""
+
+import importlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import metrics
+
+MOTORES = {'duckdb': 'utils.metrics_sql', 'polars': 'utils.metrics_polars'}
+
+MAX_DIAS = 10
+
+
+def _iguales(a, b, rtol=1e-9):
+    if isinstance(a, pd.Series):
+        if not isinstance(b, pd.Series) or list(map(str, a.index)) != list(map(str, b.index)):
+            return False
+        if not pd.api.types.is_numeric_dtype(a):
+            return list(map(str, a)) == list(map(str, b))
+        return np.allclose(a.to_numpy(dtype=float), b.to_numpy(dtype=float), rtol=rtol, equal_nan=True)
+    if isinstance(a, (float, np.floating)) or isinstance(b, (float, np.floating)):
+        return bool(np.isclose(float(a), float(b), rtol=rtol, equal_nan=True))
+    if isinstance(a, (int, np.integer)) and isinstance(b, (int, np.integer)):
+        return int(a) == int(b)
+    return str(a) == str(b)
+
+
+def _comparar(nombre, esperado, obtenido, diferencias):
+    if esperado is None or obtenido is None:
+        if (esperado is None) != (obtenido is None):
+            diferencias.append(f"{nombre}: {esperado!r} != {obtenido!r}")
+        return
+    
+    if isinstance(esperado, pd.DataFrame):
+        if list(esperado.index) != list(obtenido.index) and 'producto' not in esperado:
+            diferencias.append(f"{nombre}: índice distinto")
+        for col in esperado.columns:
+            valores = obtenido[col] if col in obtenido else None
+            if valores is None or not _iguales(esperado[col].reset_index(drop=True), valores.reset_index(drop=True)):
+                diferencias.append(f"{nombre}.{col}: distinto")
+        return
+    
+    for clave, valor in esperado.items():
+        if not _iguales(valor, obtenido.get(clave)):
+            diferencias.append(f"{nombre}.{clave}: {valor!r} != {obtenido.get(clave)!r}")
+
+
+def _diferencias(df, motor, max_dias=MAX_DIAS):
+    """Diferencias entre las métricas del módulo `motor` y las de utils.metrics"""
+    diferencias = []
+    
+    for año in sorted(df['año'].unique()):
+        _comparar(f"anuales[{año}]", metrics.calcular_metricas_anuales(df, año),
+                  motor.calcular_metricas_anuales(df, año), diferencias)
+    
+    for año, mes in df[['año', 'mes']].drop_duplicates().sort_values(['año', 'mes']).itertuples(index=False):
+        _comparar(f"mensuales[{año}-{mes}]", metrics.calcular_metricas_mensuales(df, año, mes),
+                  motor.calcular_metricas_mensuales(df, año, mes), diferencias)
+    
+    fechas = np.sort(df['fecha'].unique())
+    for fecha in fechas[np.linspace(0, len(fechas) - 1, min(max_dias, len(fechas))).astype(int)]:
+        _comparar(f"diarias[{pd.Timestamp(fecha).date()}]", metrics.calcular_metricas_diarias(df, fecha),
+                  motor.calcular_metricas_diarias(df, fecha), diferencias)
+    
+    _comparar("top_productos", metrics.calcular_top_productos(df).reset_index(),
+              motor.calcular_top_productos(df).reset_index(), diferencias)
+    
+    # pandas ordena los empates de score sin criterio fijo: se comparan todos los productos
+    orden = ['score_riesgo', 'producto']
+    _comparar("productos_riesgo",
+              metrics.calcular_productos_riesgo(df, top_n=len(df)).sort_values(orden, ascending=[False, True]),
+              motor.calcular_productos_riesgo(df, top_n=len(df)).sort_values(orden, ascending=[False, True]),
+              diferencias)
+    
+    return diferencias
+
+
+@pytest.fixture(params=list(MOTORES))
+def motor(request):
+    pytest.importorskip(request.param)
+    return importlib.import_module(MOTORES[request.param])
+
+
+def test_paridad_datos_cargados(datos, motor):
+    assert _diferencias(datos, motor) == []
+
+
+def test_paridad_subconjunto(datos, motor):
+    abril = datos[datos['mes'] == 4]
+    assert _diferencias(abril, motor) == []
@@ -1,69 +1,268 @@
 # utils/data_loader.py - VERSIÓN CORREGIDA
+import hashlib
+import io
+import json
+import os
+import tempfile
+import weakref
 import pandas as pd
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-@st.cache_data(ttl=3600, show_spinner=False)
-def cargar_datos():
-    """Carga datos desde CSV - USA CÓDIGO COMO IDENTIFICADOR"""
+
+# ==========================================
+# SNAPSHOT COLUMNAR (ARROW IPC, MAPEADO EN MEMORIA)
+# ==========================================
+
+BASE_PATH = Path(__file__).parent.parent / "data"
+CACHE_PATH = BASE_PATH / "cache"
+
+ARCHIVOS = {
+    'Le Meridiem': BASE_PATH / 'dataset_lemeridiem_DIARIO.csv',
+    'Sabina': BASE_PATH / 'dataset_sabina_DIARIO.csv',
+    'Principal': BASE_PATH / 'dataset_principal_DIARIO.csv'
+}
+
+# Subir este número cuando cambie el procesamiento de _procesar_datos:
+# invalida los snapshots existentes aunque los CSV no hayan cambiado
+VERSION_PROCESAMIENTO = 2
+
+
+# Hash del contenido por archivo, recalculado solo si cambian tamaño o mtime:
+# así calcular la huella en cada rerun cuesta un stat() por archivo
+_HASHES_CONTENIDO = {}
+
+
+def _hash_contenido(archivo):
+    """Hash del contenido de un archivo (memorizado por tamaño y mtime)"""
+    stat = archivo.stat()
+    clave = (stat.st_size, stat.st_mtime_ns)
     
-    base_path = Path(__file__).parent.parent / "data"
+    memorizado = _HASHES_CONTENIDO.get(archivo)
+    if memorizado and memorizado[0] == clave:
+        return memorizado[1]
     
-    archivos = {
-        'Le Meridiem': base_path / 'dataset_lemeridiem_DIARIO.csv',
-        'Sabina': base_path / 'dataset_sabina_DIARIO.csv',
-        'Principal': base_path / 'dataset_principal_DIARIO.csv'
-    }
+    contenido = hashlib.sha1()
+    with open(archivo, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            contenido.update(bloque)
     
-    dfs = []
-    
-    progress_bar = st.progress(0, text="🔄 Cargando datos...")
-    total_archivos = len(archivos)
+    _HASHES_CONTENIDO[archivo] = (clave, contenido.hexdigest())
+    return contenido.hexdigest()
+
+
+def _huella_fuentes(archivos):
+    """Huella del contenido de los CSV fuente (y de la versión de procesamiento)"""
+    huella = hashlib.sha1(f"v{VERSION_PROCESAMIENTO}".encode())
     
-    for idx, (nombre, archivo) in enumerate(archivos.items(), 1):
-        try:
-            progress_bar.progress(idx / total_archivos, 
-                                text=f"🔄 Cargando {nombre}... ({idx}/{total_archivos})")
-            
-            # Leer CSV
-            df = pd.read_csv(archivo, parse_dates=['fecha'])
-            
-            df['restaurante'] = nombre
-            dfs.append(df)
-            
-        except Exception as e:
-            st.error(f"❌ Error cargando {nombre}: {str(e)}")
+    for nombre, archivo in archivos.items():
+        huella.update(nombre.encode())
+        
+        if not archivo.exists():
+            huella.update(b'<sin-archivo>')
             continue
+        
+        huella.update(_hash_contenido(archivo).encode())
     
-    progress_bar.empty()
+    return huella.hexdigest()[:16]
+
+
+def _ruta_snapshot(huella):
+    return CACHE_PATH / f"snapshot_{huella}.arrow"
+
+
+def _abrir_snapshot(huella):
+    """Tabla Arrow del snapshot mapeada en memoria, o None si no existe
     
-    if not dfs:
+    El archivo IPC se escribe sin compresión, así que los buffers de las
+    columnas apuntan directamente a las páginas del archivo: todos los
+    procesos del servidor comparten la misma copia a través de la caché de
+    páginas del sistema operativo.
+    """
+    ruta = _ruta_snapshot(huella)
+    
+    if not ruta.exists():
         return None
     
-    df = pd.concat(dfs, ignore_index=True)
+    try:
+        import pyarrow as pa
+        
+        with pa.memory_map(str(ruta), 'r') as fuente:
+            return pa.ipc.open_file(fuente).read_all()
+    except Exception:
+        # Snapshot corrupto o pyarrow no disponible: se reconstruye
+        return None
+
+
+def _tabla_a_pandas(tabla, columnas=None):
+    """Convierte a pandas solo las columnas pedidas de la tabla Arrow
     
-    # Procesar fechas
-    df['fecha'] = pd.to_datetime(df['fecha'])
-    df['año'] = df['fecha'].dt.year
-    df['mes'] = df['fecha'].dt.month
-    df['mes_nombre'] = df['fecha'].dt.strftime('%B')
-    df['dia'] = df['fecha'].dt.day
-    df['dia_semana'] = df['fecha'].dt.day_name()
-    df['semana_año'] = df['fecha'].dt.isocalendar().week
-    df['es_fin_semana'] = df['dia_semana'].isin(['Saturday', 'Sunday']).astype(int)
+    Con split_blocks las columnas numéricas sin nulos quedan como vistas sobre
+    los buffers mapeados (sin copia).
+    """
+    if columnas is not None:
+        tabla = tabla.select([c for c in columnas if c in tabla.column_names])
     
-    # ==========================================
-    # CRÍTICO: CONSOLIDAR DESCRIPCIONES POR CÓDIGO
-    # ==========================================
+    df = tabla.to_pandas(split_blocks=True)
     
-    # Para cada código, tomar la descripción más reciente
-    descripcion_por_codigo = df.sort_values('fecha', ascending=False).groupby('codigo_producto')['descripcion_producto'].first()
+    metadatos = tabla.schema.metadata or {}
+    if b'memoria_mb' in metadatos:
+        df.attrs['memoria_mb'] = json.loads(metadatos[b'memoria_mb'])
     
-    # Mapear descripciones consolidadas
-    df['descripcion_consolidada'] = df['codigo_producto'].map(descripcion_por_codigo)
+    return df
+
+
+def _leer_snapshot(huella):
+    """Lee el snapshot procesado completo si existe para esta huella"""
+    tabla = _abrir_snapshot(huella)
     
-    # USAR DESCRIPCIÓN CONSOLIDADA como "producto"
-    df['producto'] = df['descripcion_consolidada'].str.strip().str.upper()
+    if tabla is None:
+        return None
+    
+    return _tabla_a_pandas(tabla)
+
+
+def _tabla_desde_pandas(df):
+    """Tabla Arrow del DataFrame procesado, con el reporte de memoria en el esquema"""
+    import pyarrow as pa
+    
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    
+    if 'memoria_mb' in df.attrs:
+        metadatos = dict(tabla.schema.metadata or {})
+        metadatos[b'memoria_mb'] = json.dumps(df.attrs['memoria_mb']).encode()
+        tabla = tabla.replace_schema_metadata(metadatos)
+    
+    return tabla
+
+
+def _guardar_snapshot(df, huella):
+    """Persiste el DataFrame procesado y elimina snapshots obsoletos"""
+    ruta = _ruta_snapshot(huella)
+    
+    try:
+        import pyarrow as pa
+        
+        CACHE_PATH.mkdir(parents=True, exist_ok=True)
+        tabla = _tabla_desde_pandas(df)
+        
+        # Escribir a un temporal propio de este proceso y renombrar para no
+        # dejar archivos a medias (los procesos que ya mapearon el anterior
+        # siguen leyéndolo)
+        descriptor, temporal = tempfile.mkstemp(dir=CACHE_PATH, prefix=f'{ruta.stem}.', suffix='.tmp')
+        os.close(descriptor)
+        try:
+            with pa.OSFile(temporal, 'wb') as destino:
+                with pa.ipc.new_file(destino, tabla.schema) as escritor:
+                    escritor.write_table(tabla)
+            os.replace(temporal, ruta)
+        finally:
+            Path(temporal).unlink(missing_ok=True)
+        
+        # Solo snapshots terminados: los .tmp pueden ser de otro proceso escribiendo
+        for viejo in CACHE_PATH.glob('snapshot_*.arrow'):
+            if viejo != ruta:
+                viejo.unlink(missing_ok=True)
+    except Exception:
+        # El snapshot es solo una optimización: sin él se sigue funcionando
+        pass
+
+
+# ==========================================
+# ESQUEMA DE TIPOS
+# ==========================================
+
+# Textos repetidos fila a fila: como categóricas solo se guarda un código por fila
+COLUMNAS_CATEGORICAS = [
+    'restaurante', 'producto', 'descripcion_producto', 'descripcion_consolidada',
+    'nombre_grupo', 'nombre_linea', 'dia_semana', 'mes_nombre',
+    'unidad_medida', 'mes_hoja_original', 'evento_especial'
+]
+
+# Contadores y medidas con tipos compactos. Las columnas en pesos se dejan
+# en float64: en float32 las sumas anuales pierden precisión.
+TIPOS_COMPACTOS = {
+    'año': 'int16',
+    'mes': 'int8',
+    'dia': 'int8',
+    'semana_año': 'int8',
+    'es_fin_semana': 'int8',
+    'tiene_evento': 'int8',
+    'codigo_grupo': 'int16',
+    'codigo_linea': 'int16',
+    'cantidad_vendida_diaria': 'int32',
+    'peso_aplicado': 'float32'
+}
+
+
+def _memoria_mb(df):
+    """Memoria real del DataFrame en MB (incluye el contenido de los textos)"""
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def _aplicar_esquema(df):
+    """Convierte textos a categóricas y baja contadores a tipos compactos"""
+    memoria_antes = _memoria_mb(df)
+    
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    
+    for col, tipo in TIPOS_COMPACTOS.items():
+        if col in df.columns:
+            df[col] = df[col].astype(tipo)
+    
+    df.attrs['memoria_mb'] = {
+        'antes': round(float(memoria_antes), 2),
+        'despues': round(float(_memoria_mb(df)), 2)
+    }
+    
+    return df
+
+
+def get_reporte_memoria(df):
+    """Memoria antes/después del esquema tipado (MB), si está disponible"""
+    return df.attrs.get('memoria_mb')
+
+
+# ==========================================
+# CARGA Y PROCESAMIENTO
+# ==========================================
+
+def construir_calendario(fechas):
+    """Dimensión calendario: una fila por fecha única (ordenada)
+    
+    Los atributos de texto (mes, día de la semana) se calculan una sola vez
+    por fecha en lugar de una vez por fila de ventas.
+    """
+    calendario = pd.DataFrame({'fecha': pd.DatetimeIndex(pd.unique(pd.Series(fechas))).sort_values()})
+    
+    calendario['año'] = calendario['fecha'].dt.year
+    calendario['mes'] = calendario['fecha'].dt.month
+    calendario['mes_nombre'] = calendario['fecha'].dt.strftime('%B').astype('category')
+    calendario['dia'] = calendario['fecha'].dt.day
+    calendario['dia_semana'] = calendario['fecha'].dt.day_name().astype('category')
+    calendario['semana_año'] = calendario['fecha'].dt.isocalendar().week
+    calendario['es_fin_semana'] = (calendario['fecha'].dt.dayofweek >= 5).astype(int)
+    
+    return calendario
+
+
+# Columnas del calendario que se copian a cada fila de ventas
+COLUMNAS_CALENDARIO = ['año', 'mes', 'mes_nombre', 'dia', 'dia_semana', 'semana_año', 'es_fin_semana']
+
+
+def _derivar_columnas(df):
+    """Columnas de calendario, ventas y eventos"""
+    
+    # Procesar fechas: cada fila recibe su código de fecha en el calendario
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    codigos_fecha, fechas = pd.factorize(df['fecha'], sort=True)
+    calendario = construir_calendario(fechas)
+    
+    for col in COLUMNAS_CALENDARIO:
+        df[col] = calendario[col].array.take(codigos_fecha)
     
     # Columna de ventas
     df['venta_pesos'] = df['valor_total_diario']
@@ -74,7 +273,532 @@ def cargar_datos():
     else:
         df['tiene_evento'] = 0
     
-    return df.sort_values('fecha').reset_index(drop=True)
+    return df
+
+
+def _ultimas_descripciones(df):
+    """Descripción más reciente (y su fecha) de cada código de producto
+    
+    Una sola pasada con idxmax sobre la fecha, sin ordenar todo el DataFrame.
+    """
+    validas = df[df['codigo_producto'].notna() & df['descripcion_producto'].notna()]
+    idx_ultima = validas.groupby('codigo_producto')['fecha'].idxmax()
+    
+    return df.loc[idx_ultima.values, ['codigo_producto', 'fecha', 'descripcion_producto']].set_index('codigo_producto')
+
+
+def _consolidar_descripciones(df, ultimas):
+    """Asigna a cada fila la descripción consolidada de su código"""
+    
+    # Mapear descripciones consolidadas
+    descripcion_por_codigo = ultimas['descripcion_producto']
+    df['descripcion_consolidada'] = df['codigo_producto'].map(descripcion_por_codigo)
+    
+    # USAR DESCRIPCIÓN CONSOLIDADA como "producto"
+    producto_por_codigo = descripcion_por_codigo.str.strip().str.upper()
+    df['producto'] = df['codigo_producto'].map(producto_por_codigo)
+    
+    return df
+
+
+def _procesar_datos(df):
+    """Columnas derivadas y consolidación de descripciones"""
+    
+    df = _derivar_columnas(df)
+    
+    # ==========================================
+    # CRÍTICO: CONSOLIDAR DESCRIPCIONES POR CÓDIGO
+    # ==========================================
+    
+    # Para cada código, tomar la descripción más reciente
+    df = _consolidar_descripciones(df, _ultimas_descripciones(df))
+    
+    df = df.sort_values('fecha').reset_index(drop=True)
+    
+    return _aplicar_esquema(df)
+
+
+def _concatenar(dfs):
+    """pd.concat que conserva las columnas categóricas (une sus categorías)"""
+    for col in COLUMNAS_CATEGORICAS:
+        if not all(isinstance(d[col].dtype, pd.CategoricalDtype) for d in dfs if col in d.columns):
+            continue
+        
+        categorias = pd.Index([])
+        for d in dfs:
+            if col in d.columns:
+                categorias = categorias.append(d[col].cat.categories)
+        categorias = categorias.unique()
+        
+        for d in dfs:
+            if col in d.columns:
+                d[col] = d[col].cat.set_categories(categorias)
+    
+    return pd.concat(dfs, ignore_index=True)
+
+
+def _leer_csv(nombre, archivo, desde_byte=0):
+    """Lee el CSV de un restaurante (motor pyarrow, multihilo)
+    
+    Con `desde_byte` > 0 solo se parsea lo agregado al archivo después de
+    esa posición. Devuelve el DataFrame (None si no hay filas nuevas) y la
+    posición hasta la que se leyó.
+    """
+    with open(archivo, 'rb') as f:
+        encabezado = f.readline()
+        if desde_byte:
+            f.seek(desde_byte)
+        cuerpo = f.read()
+        fin = f.tell()
+    
+    if not cuerpo.strip():
+        return None, fin
+    
+    df = pd.read_csv(io.BytesIO(encabezado + cuerpo), parse_dates=['fecha'], engine='pyarrow')
+    df['restaurante'] = nombre
+    return df, fin
+
+
+def _leer_fuentes(archivos, desde_bytes=None):
+    """Lee los CSV de todos los restaurantes en paralelo
+    
+    Devuelve {nombre: (DataFrame, bytes leídos)} en el orden de `archivos`.
+    Los errores se reportan por archivo y no detienen la carga de los demás.
+    """
+    desde_bytes = desde_bytes or {}
+    
+    progress_bar = st.progress(0, text="🔄 Cargando datos...")
+    total_archivos = len(archivos)
+    
+    resultados = {}
+    
+    with ThreadPoolExecutor(max_workers=total_archivos) as executor:
+        futuros = {
+            executor.submit(_leer_csv, nombre, archivo, desde_bytes.get(nombre, 0)): nombre
+            for nombre, archivo in archivos.items()
+        }
+        
+        for idx, futuro in enumerate(as_completed(futuros), 1):
+            nombre = futuros[futuro]
+            
+            try:
+                resultados[nombre] = futuro.result()
+            except Exception as e:
+                st.error(f"❌ Error cargando {nombre}: {str(e)}")
+            
+            progress_bar.progress(idx / total_archivos, 
+                                text=f"🔄 Cargado {nombre}... ({idx}/{total_archivos})")
+    
+    progress_bar.empty()
+    
+    return {nombre: resultados[nombre] for nombre in archivos if nombre in resultados}
+
+
+# ==========================================
+# INGESTA INCREMENTAL (MARCA DE AGUA POR FECHA)
+# ==========================================
+
+def _firma_archivo(archivo, hasta_byte):
+    """Hash del contenido ya ingerido (los primeros `hasta_byte` bytes)
+    
+    Si coincide con el del manifiesto, el archivo solo creció por el final.
+    Hashear es mucho más barato que volver a parsear y procesar el CSV.
+    """
+    firma = hashlib.sha1()
+    
+    with open(archivo, 'rb') as f:
+        restante = hasta_byte
+        while restante > 0:
+            bloque = f.read(min(restante, 1 << 20))
+            if not bloque:
+                break
+            firma.update(bloque)
+            restante -= len(bloque)
+    
+    return firma.hexdigest()
+
+
+def _leer_manifiesto():
+    """Estado de la última ingesta (snapshot, bytes leídos y marcas de agua)"""
+    try:
+        with open(CACHE_PATH / 'manifiesto.json', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _guardar_manifiesto(df, huella, bytes_leidos):
+    """Registra, por restaurante, hasta dónde se ingirió cada CSV"""
+    ultima_fecha = df.groupby('restaurante', observed=True)['fecha'].max()
+    
+    manifiesto = {
+        'version': VERSION_PROCESAMIENTO,
+        'huella': huella,
+        'archivos': {
+            nombre: {
+                'bytes': fin,
+                'firma': _firma_archivo(ARCHIVOS[nombre], fin),
+                'ultima_fecha': str(ultima_fecha[nombre].date()) if nombre in ultima_fecha.index else None
+            }
+            for nombre, fin in bytes_leidos.items()
+        }
+    }
+    
+    try:
+        descriptor, temporal = tempfile.mkstemp(dir=CACHE_PATH, prefix='manifiesto.', suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+                json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+            os.replace(temporal, CACHE_PATH / 'manifiesto.json')
+        finally:
+            Path(temporal).unlink(missing_ok=True)
+    except Exception:
+        pass
+
+
+def _puede_ingerir_cola(archivo, previo):
+    """True si el archivo solo recibió filas nuevas al final desde `previo`"""
+    if not archivo.exists():
+        return False
+    
+    if archivo.stat().st_size < previo['bytes']:
+        return False
+    
+    with open(archivo, 'rb') as f:
+        f.seek(max(previo['bytes'] - 1, 0))
+        if previo['bytes'] and f.read(1) != b'\n':
+            return False
+    
+    return _firma_archivo(archivo, previo['bytes']) == previo['firma']
+
+
+def _cargar_incremental():
+    """Agrega al último snapshot solo las filas nuevas de cada CSV
+    
+    Devuelve (DataFrame, bytes leídos) o None si no es posible (no hay
+    snapshot previo, algún archivo fue reescrito o trae fechas ya ingeridas);
+    en ese caso se hace la carga completa.
+    """
+    manifiesto = _leer_manifiesto()
+    if not manifiesto or manifiesto.get('version') != VERSION_PROCESAMIENTO:
+        return None
+    
+    for nombre, previo in manifiesto['archivos'].items():
+        if nombre not in ARCHIVOS or not _puede_ingerir_cola(ARCHIVOS[nombre], previo):
+            return None
+    
+    df_base = _leer_snapshot(manifiesto['huella'])
+    if df_base is None:
+        return None
+    
+    desde_bytes = {nombre: previo['bytes'] for nombre, previo in manifiesto['archivos'].items()}
+    archivos = {nombre: archivo for nombre, archivo in ARCHIVOS.items() if archivo.exists()}
+    leidos = _leer_fuentes(archivos, desde_bytes)
+    
+    if set(leidos) != set(archivos):
+        return None
+    
+    nuevos = []
+    for nombre, (df_cola, _) in leidos.items():
+        if df_cola is None:
+            continue
+        
+        # Solo se aceptan días posteriores a la marca de agua del restaurante
+        previo = manifiesto['archivos'].get(nombre)
+        if previo and previo['ultima_fecha'] and (df_cola['fecha'] <= pd.Timestamp(previo['ultima_fecha'])).any():
+            return None
+        
+        nuevos.append(df_cola)
+    
+    bytes_leidos = {nombre: fin for nombre, (_, fin) in leidos.items()}
+    
+    if not nuevos:
+        return df_base, bytes_leidos
+    
+    memoria = df_base.attrs.get('memoria_mb', {})
+    
+    df_nuevo = _derivar_columnas(pd.concat(nuevos, ignore_index=True))
+    
+    # Descripción vigente por código: la del histórico, salvo que las filas
+    # nuevas traigan una igual o más reciente
+    ultimas = df_base.groupby('codigo_producto')['fecha'].max().to_frame()
+    ultimas['descripcion_producto'] = (
+        df_base.groupby('codigo_producto', observed=True)['descripcion_consolidada'].first().astype(object)
+    )
+    ultimas_nuevas = _ultimas_descripciones(df_nuevo)
+    
+    previas = ultimas.reindex(ultimas_nuevas.index)
+    reemplazar = previas['fecha'].isna() | (ultimas_nuevas['fecha'] >= previas['fecha'])
+    cambiados = ultimas_nuevas.index[reemplazar & (ultimas_nuevas['descripcion_producto'] != previas['descripcion_producto'])]
+    
+    ultimas = ultimas_nuevas[reemplazar].combine_first(ultimas)
+    
+    df_nuevo = _consolidar_descripciones(df_nuevo, ultimas)
+    df_nuevo = _aplicar_esquema(df_nuevo)
+    
+    # Filas históricas cuyo código cambió de descripción
+    if len(cambiados):
+        afectadas = df_base['codigo_producto'].isin(cambiados)
+        df_afectadas = _consolidar_descripciones(df_base[afectadas].copy(), ultimas)
+        df_afectadas = _aplicar_esquema(df_afectadas)
+        df_base = _concatenar([df_base[~afectadas], df_afectadas])
+    
+    df = _concatenar([df_base, df_nuevo])
+    df = df.sort_values('fecha', kind='stable').reset_index(drop=True)
+    
+    df.attrs['memoria_mb'] = {
+        'antes': round(float(memoria.get('antes', 0) + df_nuevo.attrs['memoria_mb']['antes']), 2),
+        'despues': round(float(_memoria_mb(df)), 2)
+    }
+    
+    return df, bytes_leidos
+
+
+def _cargar_completo():
+    """Lee y procesa todo el histórico de los CSV"""
+    leidos = _leer_fuentes(ARCHIVOS)
+    
+    dfs = [df for df, _ in leidos.values() if df is not None]
+    if not dfs:
+        return None
+    
+    df = _procesar_datos(pd.concat(dfs, ignore_index=True))
+    
+    return df, {nombre: fin for nombre, (_, fin) in leidos.items()}
+
+
+# Con Copy-on-Write (por defecto desde pandas 3) una vista superficial nunca
+# escribe sobre el DataFrame compartido; antes de pandas 3 se entrega una copia
+_COPY_ON_WRITE = int(pd.__version__.split('.')[0]) >= 3
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _cargar_version(huella):
+    """Tabla Arrow procesada para una huella de los CSV, mapeada desde disco"""
+    
+    tabla = _abrir_snapshot(huella)
+    if tabla is not None:
+        return tabla
+    
+    resultado = _cargar_incremental() or _cargar_completo()
+    
+    if resultado is None:
+        return None
+    
+    df, bytes_leidos = resultado
+    
+    _guardar_snapshot(df, huella)
+    _guardar_manifiesto(df, huella, bytes_leidos)
+    
+    # Sin caché en disco (p. ej. sin permisos de escritura) la tabla vive en memoria
+    return _abrir_snapshot(huella) or _tabla_desde_pandas(df)
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _convertir_columnas(huella, columnas):
+    """DataFrame pandas con las columnas pedidas de una versión de los datos"""
+    tabla = _cargar_version(huella)
+    
+    if tabla is None:
+        return None
+    
+    df = _tabla_a_pandas(tabla, columnas)
+    df.attrs['version_datos'] = huella
+    
+    return df
+
+
+def cargar_datos(columnas=None):
+    """Carga datos desde CSV - USA CÓDIGO COMO IDENTIFICADOR
+    
+    El dataset procesado se guarda una vez como archivo Arrow IPC en
+    data/cache/ y cada proceso del servidor lo abre mapeado en memoria. Si
+    los CSV no cambiaron se usa directamente; si solo se agregaron días
+    nuevos al final de los CSV, se procesan únicamente esas filas.
+    
+    `columnas` limita la conversión a pandas a las columnas que usa la
+    página (None = todas). Cada llamada devuelve una vista superficial:
+    agregar o modificar columnas en una página no afecta a las demás.
+    """
+    if columnas is not None:
+        columnas = tuple(dict.fromkeys(columnas))
+    
+    huella = _huella_fuentes(ARCHIVOS)
+    df = _convertir_columnas(huella, columnas)
+    
+    if df is None:
+        return None
+    
+    vista = df.copy(deep=not _COPY_ON_WRITE)
+    _registrar_vista(vista, f"{huella}:{','.join(columnas) if columnas else '*'}")
+    
+    return vista
+
+
+def get_version_datos(df):
+    """Huella de los CSV con la que se construyó el DataFrame"""
+    return df.attrs.get('version_datos')
+
+
+def get_version_actual():
+    """Huella de los CSV actuales: la versión que devolvería cargar_datos ahora"""
+    return _huella_fuentes(ARCHIVOS)
+
+
+# Vistas entregadas por cargar_datos: id → (referencia débil, clave, filas)
+_VISTAS_CARGADAS = {}
+
+
+def _registrar_vista(df, clave):
+    identificador = id(df)
+    referencia = weakref.ref(df, lambda _: _VISTAS_CARGADAS.pop(identificador, None))
+    _VISTAS_CARGADAS[identificador] = (referencia, clave, len(df))
+
+
+def clave_datos(df):
+    """Clave de caché para estructuras derivadas de un DataFrame de cargar_datos
+    
+    Solo tiene clave (versión de los datos y columnas) el mismo objeto que
+    devolvió cargar_datos. Rebanadas, filtros y copias heredan la versión en
+    attrs pero devuelven None: quien llama calcula sobre ellos sin caché.
+    """
+    registro = _VISTAS_CARGADAS.get(id(df))
+    if registro is None:
+        return None
+    
+    referencia, clave, filas = registro
+    if referencia() is not df or len(df) != filas:
+        return None
+    
+    return clave
+
+
+# ==========================================
+# CARGA POR BLOQUES (AGREGADOS DIARIOS)
+# ==========================================
+
+CLAVES_DIARIAS = ['fecha', 'restaurante', 'producto']
+
+
+def _a_centavos(serie):
+    """Valores en pesos (máx. 2 decimales en los CSV) como enteros en centavos
+    
+    La suma entera no depende del orden, así que agregar por bloques o sobre
+    el DataFrame completo da exactamente el mismo resultado.
+    """
+    return (serie.fillna(0) * 100).round().astype('int64')
+
+
+def _sumar_diario(df, claves, col_filas=None):
+    """Sumas de ventas (en centavos), cantidades y filas por las claves dadas"""
+    agregado = df.groupby(claves, dropna=False, observed=True, sort=True).agg(
+        venta_centavos=('venta_centavos', 'sum'),
+        cantidad_vendida_diaria=('cantidad_vendida_diaria', 'sum'),
+        filas=(col_filas, 'sum') if col_filas else ('venta_centavos', 'size')
+    )
+    agregado['cantidad_vendida_diaria'] = agregado['cantidad_vendida_diaria'].astype('int64')
+    agregado['filas'] = agregado['filas'].astype('int64')
+    
+    return agregado
+
+
+def _finalizar_diario(agregado):
+    """Agregado por CLAVES_DIARIAS con ventas de vuelta en pesos"""
+    agregado = agregado.reset_index()
+    agregado.insert(3, 'venta_pesos', agregado.pop('venta_centavos') / 100)
+    
+    return agregado
+
+
+def agregar_ventas_diarias(df):
+    """Ventas diarias por restaurante × producto a partir del DataFrame completo
+    
+    Las filas sin producto consolidado (código vacío) se conservan con
+    producto NaN para que los totales por fecha y restaurante cuadren.
+    """
+    df = df[['fecha', 'restaurante', 'producto', 'cantidad_vendida_diaria']].assign(
+        venta_centavos=_a_centavos(df['venta_pesos'])
+    )
+    
+    return _finalizar_diario(_sumar_diario(df, CLAVES_DIARIAS))
+
+
+def cargar_agregados_por_bloques(tamaño_bloque=200_000, archivos=None):
+    """Ventas diarias por restaurante × producto leyendo los CSV por bloques
+    
+    Para históricos que no caben completos en memoria: cada bloque pasa por
+    la misma derivación que cargar_datos() y se pliega en agregados por
+    (fecha, restaurante, código), sin conservar las filas crudas; la memoria
+    pico depende del tamaño de bloque y del número de combinaciones, no del
+    tamaño de los archivos. La descripción consolidada de cada código se
+    resuelve al final con la misma regla (la más reciente).
+    
+    El resultado es idéntico a agregar_ventas_diarias(cargar_datos()).
+    """
+    archivos = archivos or ARCHIVOS
+    claves_codigo = ['fecha', 'restaurante', 'codigo_producto']
+    
+    parciales = []
+    ultimas = None
+    
+    for nombre, archivo in archivos.items():
+        if not archivo.exists():
+            continue
+        
+        for bloque in pd.read_csv(archivo, parse_dates=['fecha'], chunksize=tamaño_bloque):
+            bloque['restaurante'] = nombre
+            bloque = _derivar_columnas(bloque)
+            bloque['venta_centavos'] = _a_centavos(bloque['venta_pesos'])
+            
+            # Descripción más reciente por código; ante empate gana la primera vista
+            ultimas_bloque = _ultimas_descripciones(bloque)
+            if ultimas is None:
+                ultimas = ultimas_bloque
+            else:
+                previas = ultimas['fecha'].reindex(ultimas_bloque.index)
+                mas_recientes = ultimas_bloque[previas.isna() | (ultimas_bloque['fecha'] > previas)]
+                ultimas = mas_recientes.combine_first(ultimas)
+            
+            parciales.append(_sumar_diario(bloque, claves_codigo))
+            
+            # Compactar para no acumular un parcial por bloque
+            if len(parciales) >= 8:
+                parciales = [pd.concat(parciales).groupby(level=claves_codigo, dropna=False).sum()]
+    
+    if not parciales:
+        return None
+    
+    agregado = pd.concat(parciales).groupby(level=claves_codigo, dropna=False).sum().reset_index()
+    
+    # Código -> producto consolidado, y re-agregado al grano de producto
+    agregado = _consolidar_descripciones(agregado, ultimas)
+    agregado = _aplicar_esquema(agregado)
+    
+    return _finalizar_diario(_sumar_diario(agregado, CLAVES_DIARIAS, col_filas='filas'))
+
+
+# ==========================================
+# LECTURA CON POLARS
+# ==========================================
+
+def cargar_datos_polars(columnas=None):
+    """LazyFrame de Polars sobre la versión actual de los datos (polars opcional)
+    
+    Envuelve la tabla Arrow mapeada en memoria sin pasar por pandas: las
+    columnas numéricas no se copian. (pl.scan_ipc no sirve aquí: rechaza
+    los índices -1 que pandas deja bajo los nulos de las categóricas.)
+    """
+    import polars as pl
+    
+    tabla = _cargar_version(_huella_fuentes(ARCHIVOS))
+    
+    if tabla is None:
+        return None
+    
+    if columnas is not None:
+        tabla = tabla.select(list(dict.fromkeys(columnas)))
+    
+    return pl.from_arrow(tabla).lazy()
 
 
 def get_restaurante_color(restaurante):
@@ -100,17 +824,3 @@ def formatear_numero(numero, tipo='moneda'):
         return f"{numero:,.0f}"
     else:
         return str(numero)
-
-
-@st.cache_data(ttl=3600)
-def get_metricas_generales(df):
-    """Calcula métricas generales (cacheado)"""
-    return {
-        'ventas_totales': df['venta_pesos'].sum(),
-        'unidades_totales': df['cantidad_vendida_diaria'].sum(),
-        'productos_unicos': df['codigo_producto'].nunique(),  # ← USAR CÓDIGO
-        'dias_operacion': df['fecha'].nunique(),
-        'restaurantes': df['restaurante'].unique().tolist(),
-        'fecha_min': df['fecha'].min(),
-        'fecha_max': df['fecha'].max()
-    }
@@ -6,117 +6,243 @@ Versión optimizada que minimiza pérdida de datos
 import pandas as pd
 import numpy as np
 from datetime import timedelta
+from pandas.api.indexers import BaseIndexer
 
-def create_temporal_features(df):
-    """Crear features temporales"""
-    df = df.copy()
-    df['fecha'] = pd.to_datetime(df['fecha'])
-    
-    # Features básicas
-    df['dia_semana'] = df['fecha'].dt.dayofweek
-    df['mes'] = df['fecha'].dt.month
-    df['dia_mes'] = df['fecha'].dt.day
-    df['semana_año'] = df['fecha'].dt.isocalendar().week
-    df['trimestre'] = df['fecha'].dt.quarter
-    
-    # Features cíclicas
-    df['dia_semana_sin'] = np.sin(2 * np.pi * df['dia_semana'] / 7)
-    df['dia_semana_cos'] = np.cos(2 * np.pi * df['dia_semana'] / 7)
-    df['mes_sin'] = np.sin(2 * np.pi * df['mes'] / 12)
-    df['mes_cos'] = np.cos(2 * np.pi * df['mes'] / 12)
+# Parámetros de las features (optimizado: sin lag_30 ni window_30 para conservar datos)
+LAGS = [1, 2, 3, 7, 14]
+WINDOWS = [7, 14]
+ESTADISTICAS_ROLLING = ['mean', 'std', 'min', 'max']
+DIFFS = [1, 7]
+
+# Eventos especiales: meses en que aplica y, opcionalmente, desde qué día del mes
+EVENTOS = {
+    'es_carnaval': {'meses': [2]},                        # Febrero
+    'es_grados': {'meses': [5, 6]},                       # Mayo-Junio
+    'es_navidad': {'meses': [12], 'desde_dia': 20},       # Dic 20-31
+    'es_fin_año': {'meses': [12], 'desde_dia': 29},       # Dic 29-31
+    'es_temp_empresarial': {'meses': [11, 12]},           # Nov-Dic
+}
+
+# ==========================================
+# REGISTRO DE FEATURES
+# ==========================================
+
+# nombre -> {'entradas', 'calculo', 'parametros', 'publica'}. Las entradas son
+# otras entradas del registro o VALORES_BASE del cálculo; las no públicas son
+# intermedios compartidos
+REGISTRO_FEATURES = {}
+VALORES_BASE = ['_df', '_target_col', '_orden', 'inicios']
+
+def registrar_feature(nombre, entradas, calculo, publica=True, **parametros):
+    """Declarar una feature: calculo(*entradas, **parametros) devuelve sus valores por fila"""
+    REGISTRO_FEATURES[nombre] = {
+        'entradas': list(entradas),
+        'calculo': calculo,
+        'parametros': parametros,
+        'publica': publica
+    }
+
+class _VentanaPorSerie(BaseIndexer):
+    """Ventanas móviles que no cruzan el inicio de cada serie (`inicios`: primera fila de la serie de cada fila)"""
     
-    # Fin de semana
-    df['es_fin_semana'] = (df['dia_semana'] >= 5).astype(int)
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        end = np.arange(1, num_values + 1, dtype=np.int64)
+        start = np.maximum(end - self.window_size, self.inicios)
+        return start, end
+
+def _atras(objetivo, inicios, lag):
+    """Valor de `lag` filas atrás dentro de la misma serie (NaN al inicio de la serie)"""
+    previa = np.arange(len(objetivo)) - lag
+    return np.where(previa >= inicios, objetivo[np.maximum(previa, 0)], np.nan)
+
+def _en_evento(mes, dia_mes, meses, desde_dia=1):
+    return np.isin(mes, meses) & (dia_mes >= desde_dia)
+
+def _registrar_features():
+    """Features del predictor, con sus parámetros (LAGS, WINDOWS, EVENTOS...)"""
+    # Valores base, en el orden de cálculo (por serie y fecha)
+    registrar_feature('fechas', ['_df', '_orden'], lambda df, orden: pd.to_datetime(df['fecha']).iloc[orden], publica=False)
+    registrar_feature('objetivo', ['_df', '_target_col', '_orden'], lambda df, target_col, orden: df[target_col].to_numpy(dtype=np.float64)[orden], publica=False)
+    
+    # Lags; lag_1 (objetivo desplazado del rolling) y los de DIFFS se registran aunque no estén en LAGS
+    for lag in sorted(set(LAGS) | set(DIFFS) | {1}):
+        registrar_feature(f'lag_{lag}', ['objetivo', 'inicios'], _atras, publica=lag in LAGS, lag=lag)
+    
+    # Rolling sobre el objetivo desplazado (lag_1): una ventana por tamaño para todas las estadísticas
+    for window in WINDOWS:
+        registrar_feature(
+            f'ventana_{window}', ['lag_1', 'inicios'],
+            lambda desplazado, inicios, window: pd.Series(desplazado).rolling(_VentanaPorSerie(window_size=window, inicios=inicios), min_periods=1),
+            publica=False, window=window
+        )
+        for estadistica in ESTADISTICAS_ROLLING:
+            registrar_feature(
+                f'rolling_{estadistica}_{window}', [f'ventana_{window}'],
+                lambda ventana, estadistica: getattr(ventana, estadistica)().to_numpy(),
+                estadistica=estadistica
+            )
+    
+    # Temporales
+    registrar_feature('calendario', ['fechas'], lambda fechas: fechas.dt, publica=False)
+    registrar_feature('dia_semana', ['calendario'], lambda cal: cal.dayofweek.to_numpy())
+    registrar_feature('mes', ['calendario'], lambda cal: cal.month.to_numpy())
+    registrar_feature('dia_mes', ['calendario'], lambda cal: cal.day.to_numpy(), publica=False)
+    registrar_feature('dia_mes_norm', ['dia_mes', 'calendario'], lambda dia_mes, cal: dia_mes / cal.days_in_month.to_numpy())
+    registrar_feature('semana_año', ['calendario'], lambda cal: cal.isocalendar().week.to_numpy(dtype=np.float64))
+    registrar_feature('trimestre', ['calendario'], lambda cal: cal.quarter.to_numpy())
+    for base, periodo in [('dia_semana', 7), ('mes', 12)]:
+        for nombre, funcion in [('sin', np.sin), ('cos', np.cos)]:
+            registrar_feature(
+                f'{base}_{nombre}', [base],
+                lambda valores, periodo, funcion: funcion(2 * np.pi * valores / periodo),
+                periodo=periodo, funcion=funcion
+            )
+    registrar_feature('es_fin_semana', ['dia_semana'], lambda dia_semana: dia_semana >= 5)
+    
+    # Eventos
+    for nombre, evento in EVENTOS.items():
+        registrar_feature(nombre, ['mes', 'dia_mes'], _en_evento, **evento)
     
-    # Normalizar día del mes
-    df['dia_mes_norm'] = df['dia_mes'] / df['fecha'].dt.days_in_month
+    # Diferencias
+    for k in DIFFS:
+        registrar_feature(f'diff_{k}', ['objetivo', f'lag_{k}'], lambda objetivo, previo: objetivo - previo)
+
+_registrar_features()
+
+def get_feature_columns():
+    """Obtener lista de columnas de features (las públicas del registro, en orden)"""
+    return [nombre for nombre, feature in REGISTRO_FEATURES.items() if feature['publica']]
+
+def planificar_features(columnas):
+    """Entradas del registro a calcular para `columnas`, cada una después de sus dependencias"""
+    plan = []
+    
+    def visitar(nombre):
+        if nombre in plan or nombre in VALORES_BASE:
+            return
+        if nombre not in REGISTRO_FEATURES:
+            raise ValueError(f"Feature desconocida: {nombre}")
+        for entrada in REGISTRO_FEATURES[nombre]['entradas']:
+            visitar(entrada)
+        plan.append(nombre)
+    
+    for nombre in columnas:
+        visitar(nombre)
+    
+    return plan
+
+def _calcular_features(df, target_col, nombres, por=None):
+    """Calcula el plan de `nombres` y entrega (nombre, orden, valores) de cada feature pedida
+    
+    Orden de cálculo: por serie (`por`) y fecha, o el de df si no hay `por`;
+    `orden` son las filas de df a las que corresponden los valores. Cada
+    entrada del plan se calcula una vez y cada intermedio se libera tras su
+    último uso.
+    """
+    pedidas = set(nombres)
+    plan = planificar_features(nombres)
+    n = len(df)
+    
+    # `inicios` marca la primera fila de la serie de cada posición
+    contexto = {'_df': df, '_target_col': target_col}
+    if por is None:
+        contexto['_orden'] = np.arange(n)
+        contexto['inicios'] = np.zeros(n, dtype=np.int64)
+    else:
+        fechas = pd.to_datetime(df['fecha'])
+        series = df.groupby(por, sort=False, dropna=False).ngroup().to_numpy()
+        orden = np.lexsort((fechas.to_numpy(), series))
+        series = series[orden]
+        nuevas = np.r_[True, series[1:] != series[:-1]] if n else np.zeros(0, dtype=bool)
+        contexto['_orden'] = orden
+        contexto['inicios'] = np.maximum.accumulate(np.where(nuevas, np.arange(n), 0))
+        contexto['fechas'] = fechas.iloc[orden]
+    
+    ultimo_uso = {}
+    for paso, nombre in enumerate(plan):
+        for entrada in REGISTRO_FEATURES[nombre]['entradas']:
+            ultimo_uso[entrada] = paso
+    
+    for paso, nombre in enumerate(plan):
+        feature = REGISTRO_FEATURES[nombre]
+        if nombre not in contexto:
+            entradas = [contexto[entrada] for entrada in feature['entradas']]
+            contexto[nombre] = feature['calculo'](*entradas, **feature['parametros'])
+        if nombre in pedidas:
+            yield nombre, contexto['_orden'], contexto[nombre]
+        
+        for liberable in feature['entradas'] + [nombre]:
+            if liberable not in VALORES_BASE and ultimo_uso.get(liberable, -1) <= paso:
+                contexto.pop(liberable, None)
+
+def _agregar_features(df, target_col, columnas=None, por=None):
+    """Añade a df (ya copiado) las features de `columnas` (None = get_feature_columns())"""
+    nombres = get_feature_columns() if columnas is None else list(columnas)
+    
+    calculadas = {}
+    for nombre, orden, valores in _calcular_features(df, target_col, nombres, por):
+        valores = np.asarray(valores)
+        if valores.dtype == bool:
+            valores = valores.astype(int)
+        calculadas[nombre] = np.empty(len(df), dtype=valores.dtype)
+        calculadas[nombre][orden] = valores
+    
+    # Columnas en el orden pedido (no en el del plan)
+    for nombre in nombres:
+        df[nombre] = calculadas[nombre]
     
     return df
 
 def create_event_features(df):
-    """Crear features de eventos especiales"""
+    """Crear features de eventos especiales (ver EVENTOS)"""
     df = df.copy()
     df['fecha'] = pd.to_datetime(df['fecha'])
-    
-    # Carnaval (Febrero)
-    df['es_carnaval'] = (df['fecha'].dt.month == 2).astype(int)
-    
-    # Grados (Mayo-Junio)
-    df['es_grados'] = df['fecha'].dt.month.isin([5, 6]).astype(int)
-    
-    # Navidad (Dic 20-31)
-    df['es_navidad'] = ((df['fecha'].dt.month == 12) & (df['fecha'].dt.day >= 20)).astype(int)
-    
-    # Fin de año (Dic 29-31)
-    df['es_fin_año'] = ((df['fecha'].dt.month == 12) & (df['fecha'].dt.day >= 29)).astype(int)
-    
-    # Temporada empresarial (Nov-Dic)
-    df['es_temp_empresarial'] = df['fecha'].dt.month.isin([11, 12]).astype(int)
-    
-    return df
+    return _agregar_features(df, None, list(EVENTOS))
 
-def create_lag_features(df, target_col='cantidad_vendida_diaria', lags=[1, 2, 3, 7, 14]):
-    """Crear features de lags (optimizado: sin lag_30 para conservar datos)"""
-    df = df.copy()
-    
-    for lag in lags:
-        df[f'lag_{lag}'] = df[target_col].shift(lag)
+def create_all_features(df, target_col='cantidad_vendida_diaria', columnas=None):
+    """Crear features del registro como columnas de una copia de df (ordenado por fecha)
     
-    return df
-
-def create_rolling_features(df, target_col='cantidad_vendida_diaria', windows=[7, 14]):
-    """Crear features de rolling windows (optimizado: sin window_30)"""
+    `columnas` (por defecto get_feature_columns(); p. ej. el feature_names
+    de un modelo) elige qué features calcular.
+    """
     df = df.copy()
-    
-    for window in windows:
-        df[f'rolling_mean_{window}'] = df[target_col].shift(1).rolling(window=window, min_periods=1).mean()
-        df[f'rolling_std_{window}'] = df[target_col].shift(1).rolling(window=window, min_periods=1).std()
-        df[f'rolling_min_{window}'] = df[target_col].shift(1).rolling(window=window, min_periods=1).min()
-        df[f'rolling_max_{window}'] = df[target_col].shift(1).rolling(window=window, min_periods=1).max()
-    
-    return df
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    return _agregar_features(df, target_col, columnas)
 
-def create_all_features(df, target_col='cantidad_vendida_diaria'):
-    """Crear todas las features (versión optimizada)"""
-    df = create_temporal_features(df)
-    df = create_event_features(df)
-    df = create_lag_features(df, target_col, lags=[1, 2, 3, 7, 14])  # Sin lag_30
-    df = create_rolling_features(df, target_col, windows=[7, 14])     # Sin window_30
-    
-    # Diferencias
-    df['diff_1'] = df[target_col].diff(1)
-    df['diff_7'] = df[target_col].diff(7)
+def create_panel_features(df, target_col='cantidad_vendida_diaria', por=['restaurante', 'descripcion_producto'], columnas=None):
+    """Crear features para muchas series a la vez (restaurante × producto)
     
-    return df
-
-def get_feature_columns():
-    """Obtener lista de columnas de features (sincronizada con create_all_features)"""
-    
-    # Lags (sin lag_30)
-    lag_features = [f'lag_{lag}' for lag in [1, 2, 3, 7, 14]]
-    
-    # Rolling windows (sin window_30)
-    rolling_features = []
-    for window in [7, 14]:
-        rolling_features.extend([
-            f'rolling_mean_{window}',
-            f'rolling_std_{window}',
-            f'rolling_min_{window}',
-            f'rolling_max_{window}'
-        ])
-    
-    # Features temporales
-    temporal_features = [
-        'dia_semana', 'mes', 'dia_mes_norm', 'semana_año', 'trimestre',
-        'dia_semana_sin', 'dia_semana_cos', 'mes_sin', 'mes_cos', 'es_fin_semana'
-    ]
-    
-    # Features de eventos
-    event_features = [
-        'es_carnaval', 'es_grados', 'es_navidad', 'es_fin_año', 'es_temp_empresarial'
-    ]
+    Equivale a llamar create_all_features sobre cada serie ordenada por
+    fecha, en una sola pasada vectorizada. Devuelve el panel ordenado por
+    `por` y fecha, con índice nuevo.
+    """
+    df = df.copy()
+    df['fecha'] = pd.to_datetime(df['fecha'])
     
-    # Diferencias
-    diff_features = ['diff_1', 'diff_7']
+    series = df.groupby(por, sort=False, dropna=False).ngroup().to_numpy()
+    orden = np.lexsort((df['fecha'].to_numpy(), series))
+    df = df.iloc[orden].reset_index(drop=True)
     
-    return lag_features + rolling_features + temporal_features + event_features + diff_features
+    return _agregar_features(df, target_col, columnas, por)
+
+def create_feature_matrix(df, target_col='cantidad_vendida_diaria', por=None, columnas=None):
+    """Crear features directo en una matriz float32, calculando sólo lo necesario
+    
+    Mismos valores que create_all_features (o create_panel_features si se
+    da `por`) pero sin copias del DataFrame: cada feature pedida se escribe
+    en su columna de una matriz contigua preasignada, lista para XGBoost.
+    `columnas` (por defecto get_feature_columns(); p. ej. el feature_names
+    de un modelo) elige qué features y en qué orden. La fila i corresponde
+    a df.iloc[i]; sin `por`, df debe venir ordenado por fecha como en
+    create_all_features.
+    
+    Devuelve (matriz, columnas) con columnas = {nombre: índice de columna}.
+    """
+    nombres = get_feature_columns() if columnas is None else list(columnas)
+    columnas = {nombre: j for j, nombre in enumerate(nombres)}
+    matriz = np.empty((len(df), len(nombres)), dtype=np.float32)
+    
+    for nombre, orden, valores in _calcular_features(df, target_col, nombres, por):
+        matriz[orden, columnas[nombre]] = valores
+    
+    return matriz, columnas
@@ -0,0 +1,237 @@
+# utils/feature_store.py
+"""
+Almacén local de features por serie (restaurante × producto)
+
+Guarda en data/cache/features las features de cada serie (las de
+create_feature_matrix, o create_panel_features para todo el catálogo)
+como archivo Arrow IPC, para que reentrenar o hacer backtests no
+recalcule features de series cuyos datos no cambiaron. Cada entrada se
+identifica por restaurante, código de producto y una huella de las fechas
+y valores del objetivo de la serie (corregir un día viejo también la
+invalida); el directorio lleva la versión de las features, así que cambiar
+get_feature_columns() (o subir VERSION_FEATURES) invalida todo.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import CACHE_PATH
+from utils.feature_engineering import create_feature_matrix, create_panel_features, get_feature_columns
+
+# Subir este número cuando cambie el cálculo de alguna feature sin que
+# cambie get_feature_columns()
+VERSION_FEATURES = 1
+
+FEATURES_PATH = CACHE_PATH / "features"
+
+# ==========================================
+# CLAVES Y VERSIÓN
+# ==========================================
+
+def version_features():
+    """Hash de la definición de features (columnas y VERSION_FEATURES)"""
+    definicion = json.dumps([VERSION_FEATURES, get_feature_columns()])
+    return hashlib.sha1(definicion.encode()).hexdigest()[:16]
+
+
+def _codigo(codigos, descripcion):
+    if len(codigos) > 0:
+        return '+'.join(str(int(c)) if float(c).is_integer() else str(c) for c in sorted(codigos))
+    return f"desc:{descripcion}"
+
+
+def codigo_serie(df_serie):
+    """Código de producto de la serie: sus códigos, o la descripción si no tiene"""
+    codigos = df_serie['codigo_producto'].dropna().unique() if 'codigo_producto' in df_serie else []
+    return _codigo(codigos, df_serie['descripcion_producto'].dropna().iloc[0])
+
+
+def _hash_filas(df, target_col):
+    """Hash por fila de la fecha y el objetivo"""
+    return pd.util.hash_pandas_object(df[['fecha', target_col]], index=False).to_numpy()
+
+
+def _huella(hashes_filas):
+    return hashlib.sha1(hashes_filas.tobytes()).hexdigest()[:16]
+
+
+def clave_serie(df_serie, restaurante, target_col='cantidad_vendida_diaria'):
+    """(restaurante, código de producto, huella de fechas y objetivo en orden) de la serie"""
+    return (restaurante, codigo_serie(df_serie), _huella(_hash_filas(df_serie, target_col)))
+
+
+def _ruta(restaurante, codigo, version):
+    nombre = hashlib.sha1(f"{restaurante}|{codigo}".encode()).hexdigest()[:16]
+    return FEATURES_PATH / f"v_{version}" / f"{nombre}.arrow"
+
+
+# ==========================================
+# LECTURA Y ESCRITURA
+# ==========================================
+
+def leer_features(claves, version=None):
+    """Features guardadas de varias series: {clave: DataFrame o None si no hay (o sus datos cambiaron)}"""
+    import pyarrow as pa
+    
+    version = version or version_features()
+    resultado = {}
+    encontradas = {}
+    
+    for clave in claves:
+        restaurante, codigo, huella = clave
+        ruta = _ruta(restaurante, codigo, version)
+        resultado[clave] = None
+        
+        if not ruta.exists():
+            continue
+        
+        try:
+            with pa.memory_map(str(ruta), 'r') as fuente:
+                tabla = pa.ipc.open_file(fuente).read_all()
+        except Exception:
+            # Entrada corrupta: se recalcula
+            continue
+        
+        metadatos = tabla.schema.metadata or {}
+        if metadatos.get(b'huella', b'').decode() != huella:
+            continue
+        
+        encontradas[clave] = tabla.replace_schema_metadata(None)
+    
+    # Una sola conversión a pandas para todo el lote
+    if encontradas:
+        todas = pa.concat_tables(list(encontradas.values()), promote_options='default').to_pandas()
+        inicio = 0
+        for clave, tabla in encontradas.items():
+            resultado[clave] = todas.iloc[inicio:inicio + tabla.num_rows].reset_index(drop=True)
+            inicio += tabla.num_rows
+    
+    return resultado
+
+
+def guardar_features(entradas, version=None):
+    """Persiste {clave: DataFrame (o tabla Arrow) de features} y borra versiones obsoletas"""
+    import pyarrow as pa
+    
+    version = version or version_features()
+    directorio = FEATURES_PATH / f"v_{version}"
+    directorio.mkdir(parents=True, exist_ok=True)
+    
+    for (restaurante, codigo, huella), features in entradas.items():
+        tabla = features if isinstance(features, pa.Table) else pa.Table.from_pandas(features, preserve_index=False)
+        metadatos = dict(tabla.schema.metadata or {})
+        metadatos[b'huella'] = huella.encode()
+        tabla = tabla.replace_schema_metadata(metadatos)
+        
+        # Escribir a un temporal propio de este proceso y renombrar para no
+        # dejar archivos a medias
+        ruta = _ruta(restaurante, codigo, version)
+        descriptor, temporal = tempfile.mkstemp(dir=directorio, prefix=f'{ruta.stem}.', suffix='.tmp')
+        os.close(descriptor)
+        try:
+            with pa.OSFile(temporal, 'wb') as destino:
+                with pa.ipc.new_file(destino, tabla.schema) as escritor:
+                    escritor.write_table(tabla)
+            os.replace(temporal, ruta)
+        finally:
+            Path(temporal).unlink(missing_ok=True)
+    
+    for viejo in FEATURES_PATH.glob('v_*'):
+        if viejo != directorio:
+            shutil.rmtree(viejo, ignore_errors=True)
+
+
+def _columnas_guardadas(features, target_col):
+    """Fecha, objetivo y features; las features en float32 (XGBoost entrena en float32)"""
+    columnas = get_feature_columns()
+    guardadas = pd.DataFrame(features[columnas].to_numpy(dtype=np.float32), columns=columnas)
+    guardadas.insert(0, target_col, features[target_col].to_numpy())
+    guardadas.insert(0, 'fecha', features['fecha'].to_numpy())
+    return guardadas
+
+
+def _features_serie(df_serie, target_col):
+    """Como _columnas_guardadas, con las features escritas directo en float32 por create_feature_matrix"""
+    matriz, columnas = create_feature_matrix(df_serie, target_col)
+    guardadas = pd.DataFrame(matriz, columns=list(columnas))
+    guardadas.insert(0, target_col, df_serie[target_col].to_numpy())
+    guardadas.insert(0, 'fecha', pd.to_datetime(df_serie['fecha']).to_numpy())
+    return guardadas
+
+
+# ==========================================
+# FEATURES CON CACHÉ
+# ==========================================
+
+def get_features_serie(df_serie, restaurante, target_col='cantidad_vendida_diaria'):
+    """Features de una serie ordenada por fecha: del almacén si sus datos no cambiaron"""
+    clave = clave_serie(df_serie, restaurante, target_col)
+    
+    try:
+        features = leer_features([clave])[clave]
+    except ImportError:
+        # Sin pyarrow no hay almacén: se calcula siempre
+        return _features_serie(df_serie, target_col)
+    
+    if features is None:
+        features = _features_serie(df_serie, target_col)
+        try:
+            guardar_features({clave: features})
+        except OSError:
+            # El almacén es solo una optimización: sin él se sigue funcionando
+            pass
+    
+    return features
+
+
+def get_features_panel(df, target_col='cantidad_vendida_diaria', por=['restaurante', 'descripcion_producto']):
+    """Features de todas las series de df: {clave: DataFrame}
+    
+    Lee del almacén en un solo lote y calcula las faltantes juntas con
+    create_panel_features.
+    """
+    agrupado = df.groupby(por, sort=False, observed=True)
+    resumen = agrupado.agg(restaurante=('restaurante', 'first'), descripcion=('descripcion_producto', 'first'))
+    codigos = df.dropna(subset=['codigo_producto']).groupby(por, observed=True)['codigo_producto'].unique()
+    
+    # Huella de cada serie con sus filas en orden de fecha, como en clave_serie
+    hashes = _hash_filas(df, target_col)
+    fechas = df['fecha'].to_numpy()
+    posiciones = agrupado.indices
+    
+    grupos = {}
+    for llave, fila in zip(resumen.index, resumen.itertuples(index=False)):
+        filas = posiciones[llave][np.argsort(fechas[posiciones[llave]], kind='stable')]
+        clave = (fila.restaurante, _codigo(codigos.get(llave, []), fila.descripcion), _huella(hashes[filas]))
+        grupos[clave] = llave
+    
+    features = leer_features(list(grupos))
+    faltantes = [clave for clave, valor in features.items() if valor is None]
+    
+    if faltantes:
+        llaves = pd.MultiIndex.from_tuples([grupos[clave] for clave in faltantes], names=por)
+        pendientes = df[pd.MultiIndex.from_frame(df[por]).isin(llaves)]
+        panel = create_panel_features(pendientes, target_col, por)
+        guardadas = _columnas_guardadas(panel, target_col)
+        
+        # El panel viene ordenado por serie: cada una es un tramo contiguo,
+        # que se guarda como rebanada (sin copia) de una sola tabla Arrow
+        import pyarrow as pa
+        tabla = pa.Table.from_pandas(guardadas, preserve_index=False)
+        tablas = {}
+        por_llave = {llave: clave for clave, llave in grupos.items()}
+        for llave, posiciones in panel.groupby(por, sort=False, observed=True).indices.items():
+            clave = por_llave[llave]
+            inicio, filas = posiciones[0], len(posiciones)
+            tablas[clave] = tabla.slice(inicio, filas)
+            features[clave] = guardadas.iloc[inicio:inicio + filas].reset_index(drop=True)
+        
+        guardar_features(tablas)
+    
+    return features
@@ -0,0 +1,259 @@
+"""
+Features incrementales para Predictor
+Actualiza las features de cada serie (restaurante × producto) con un día
+nuevo en tiempo constante, sin recalcular la historia
+"""
+
+import pandas as pd
+import numpy as np
+from collections import deque
+import pickle
+import os
+
+from utils.feature_engineering import DIFFS, ESTADISTICAS_ROLLING, EVENTOS, LAGS, WINDOWS, get_feature_columns
+
+HISTORIA = max(LAGS + WINDOWS + DIFFS)
+
+class _Ventana:
+    """Ventana móvil de los últimos `tamaño` valores: sumas corrientes y deques monótonas para min/max"""
+    
+    def __init__(self, tamaño):
+        self.tamaño = tamaño
+        self.n = 0
+        self.suma = 0.0
+        self.suma_cuadrados = 0.0
+        self.minimos = deque()  # (posición, valor) con valores crecientes
+        self.maximos = deque()  # (posición, valor) con valores decrecientes
+    
+    def agregar(self, posicion, valor, saliente):
+        """Añade el valor de `posicion`; `saliente` es el que abandona la ventana (o None)"""
+        if saliente is not None and not np.isnan(saliente):
+            self.n -= 1
+            self.suma -= saliente
+            self.suma_cuadrados -= saliente * saliente
+        
+        if not np.isnan(valor):
+            self.n += 1
+            self.suma += valor
+            self.suma_cuadrados += valor * valor
+            
+            while self.minimos and self.minimos[-1][1] >= valor:
+                self.minimos.pop()
+            self.minimos.append((posicion, valor))
+            while self.maximos and self.maximos[-1][1] <= valor:
+                self.maximos.pop()
+            self.maximos.append((posicion, valor))
+        
+        limite = posicion - self.tamaño
+        while self.minimos and self.minimos[0][0] <= limite:
+            self.minimos.popleft()
+        while self.maximos and self.maximos[0][0] <= limite:
+            self.maximos.popleft()
+    
+    def estadisticas(self):
+        """{'mean', 'std', 'min', 'max'} como rolling(min_periods=1) de pandas"""
+        if self.n == 0:
+            return {'mean': np.nan, 'std': np.nan, 'min': np.nan, 'max': np.nan}
+        
+        media = self.suma / self.n
+        if self.n > 1:
+            # n·Σx² − (Σx)² es exacto con cantidades enteras: ventana constante → 0
+            varianza = (self.n * self.suma_cuadrados - self.suma * self.suma) / (self.n * (self.n - 1))
+            desviacion = np.sqrt(max(varianza, 0.0))
+        else:
+            desviacion = np.nan
+        
+        return {'mean': media, 'std': desviacion, 'min': self.minimos[0][1], 'max': self.maximos[0][1]}
+
+class _Serie:
+    """Estado de una serie: buffer circular de los últimos HISTORIA valores y sus ventanas"""
+    
+    def __init__(self):
+        self.buffer = np.full(HISTORIA, np.nan)
+        self.posicion = 0  # valores vistos
+        self.ultima_fecha = None
+        self.ventanas = [_Ventana(window) for window in WINDOWS]
+    
+    def atras(self, k):
+        """Valor de hace `k` días (NaN si la serie es más corta)"""
+        if k > self.posicion:
+            return np.nan
+        return self.buffer[(self.posicion - k) % HISTORIA]
+    
+    def agregar(self, fecha, valor):
+        for ventana in self.ventanas:
+            saliente = self.atras(ventana.tamaño) if self.posicion >= ventana.tamaño else None
+            ventana.agregar(self.posicion, valor, saliente)
+        
+        self.buffer[self.posicion % HISTORIA] = valor
+        self.posicion += 1
+        self.ultima_fecha = fecha
+
+def _features_calendario(fecha):
+    """Features temporales y de eventos de una fecha (como create_temporal_features + create_event_features)"""
+    dia_semana = fecha.dayofweek
+    mes = fecha.month
+    dia_mes = fecha.day
+    
+    features = {
+        'dia_semana': dia_semana,
+        'mes': mes,
+        'dia_mes_norm': dia_mes / fecha.days_in_month,
+        'semana_año': fecha.isocalendar()[1],
+        'trimestre': fecha.quarter,
+        'dia_semana_sin': np.sin(2 * np.pi * dia_semana / 7),
+        'dia_semana_cos': np.cos(2 * np.pi * dia_semana / 7),
+        'mes_sin': np.sin(2 * np.pi * mes / 12),
+        'mes_cos': np.cos(2 * np.pi * mes / 12),
+        'es_fin_semana': dia_semana >= 5,
+    }
+    for nombre, evento in EVENTOS.items():
+        features[nombre] = mes in evento['meses'] and dia_mes >= evento.get('desde_dia', 1)
+    
+    return features
+
+class StreamingFeatures:
+    """Features de get_feature_columns() actualizadas día a día, O(1) por serie"""
+    
+    def __init__(self, target_col='cantidad_vendida_diaria', por=['restaurante', 'descripcion_producto']):
+        self.target_col = target_col
+        self.por = list(por)
+        self.columnas = {nombre: j for j, nombre in enumerate(get_feature_columns())}
+        self.series = {}
+    
+    @staticmethod
+    def _clave(valores):
+        return tuple(None if pd.isna(v) else v for v in valores)
+    
+    @classmethod
+    def from_history(cls, df, target_col='cantidad_vendida_diaria', por=['restaurante', 'descripcion_producto']):
+        """Estado inicial a partir del histórico (sólo se reproducen los últimos HISTORIA días de cada serie)"""
+        motor = cls(target_col, por)
+        
+        fechas = pd.to_datetime(df['fecha'])
+        series = df.groupby(motor.por, sort=False, dropna=False).ngroup().to_numpy()
+        orden = np.lexsort((fechas.to_numpy(), series))
+        
+        recientes = df.iloc[orden].assign(fecha=fechas.iloc[orden].to_numpy())
+        recientes = recientes.groupby(series[orden], sort=False).tail(HISTORIA)
+        
+        for fila in recientes[motor.por + ['fecha', target_col]].itertuples(index=False):
+            motor._serie(fila[:-2]).agregar(fila[-2], float(fila[-1]))
+        
+        return motor
+    
+    def _serie(self, clave):
+        clave = self._clave(clave)
+        serie = self.series.get(clave)
+        if serie is None:
+            serie = self.series[clave] = _Serie()
+        return serie
+    
+    @staticmethod
+    def _error_orden(clave, fecha, ultima_fecha):
+        return ValueError(
+            f"Día {fecha.date()} repetido o fuera de orden en la serie {clave} "
+            f"(día anterior: {ultima_fecha.date()})"
+        )
+    
+    def _fila(self, serie, fecha, valor):
+        """Fila de features (float32) de `valor` con la historia de la serie, y registro del valor"""
+        fila = np.empty(len(self.columnas), dtype=np.float32)
+        for nombre, valor_feature in _features_calendario(fecha).items():
+            fila[self.columnas[nombre]] = valor_feature
+        
+        for lag in LAGS:
+            fila[self.columnas[f'lag_{lag}']] = serie.atras(lag)
+        for k in DIFFS:
+            fila[self.columnas[f'diff_{k}']] = valor - serie.atras(k)
+        
+        for ventana in serie.ventanas:
+            estadisticas = ventana.estadisticas()
+            for nombre in ESTADISTICAS_ROLLING:
+                fila[self.columnas[f'rolling_{nombre}_{ventana.tamaño}']] = estadisticas[nombre]
+        
+        serie.agregar(fecha, valor)
+        return fila
+    
+    def append(self, clave, fecha, valor):
+        """Registra el día `fecha` de la serie `clave` y devuelve su fila de features (float32)
+        
+        Lanza ValueError si `fecha` no es posterior al último día registrado de la serie.
+        """
+        serie = self._serie(clave)
+        fecha = pd.Timestamp(fecha)
+        
+        if serie.ultima_fecha is not None and fecha <= serie.ultima_fecha:
+            raise self._error_orden(self._clave(clave), fecha, serie.ultima_fecha)
+        
+        return self._fila(serie, fecha, float(valor))
+    
+    def pendientes(self, df):
+        """Filas de df posteriores al último día registrado de su serie, en orden de fecha (listas para update)"""
+        ultimas = pd.Series([
+            serie.ultima_fecha if serie is not None else pd.NaT
+            for serie in map(self.series.get, map(self._clave, df[self.por].itertuples(index=False)))
+        ], index=df.index, dtype='datetime64[ns]')
+        fechas = pd.to_datetime(df['fecha'])
+        
+        return df[ultimas.isna() | (fechas > ultimas)].sort_values('fecha', kind='stable')
+    
+    def update(self, dia):
+        """Registra un bloque de días nuevos (columnas `por`, fecha y objetivo, en orden de fecha)
+        
+        Como en create_panel_features, cada fila es un paso de su serie: varias
+        filas de una serie en un mismo día son pasos consecutivos y los días
+        sin filas (huecos) no cuentan para lags ni ventanas. Si alguna fila no
+        es posterior a los días ya registrados de su serie, o el bloque no
+        viene en orden de fecha, lanza ValueError sin registrar nada.
+        
+        Devuelve (matriz, columnas) como create_feature_matrix: la fila i es dia.iloc[i].
+        """
+        filas = [
+            (self._clave(fila[:-2]), pd.Timestamp(fila[-2]), float(fila[-1]))
+            for fila in dia[self.por + ['fecha', self.target_col]].itertuples(index=False)
+        ]
+        
+        ultimas = {}
+        for clave, fecha, _ in filas:
+            if clave in ultimas:
+                ultima_fecha, valida = ultimas[clave], fecha >= ultimas[clave]
+            else:
+                serie = self.series.get(clave)
+                ultima_fecha = serie.ultima_fecha if serie is not None else None
+                valida = ultima_fecha is None or fecha > ultima_fecha
+            if not valida:
+                raise self._error_orden(clave, fecha, ultima_fecha)
+            ultimas[clave] = fecha
+        
+        matriz = np.empty((len(filas), len(self.columnas)), dtype=np.float32)
+        for i, (clave, fecha, valor) in enumerate(filas):
+            matriz[i] = self._fila(self._serie(clave), fecha, valor)
+        
+        return matriz, self.columnas
+    
+    def save(self, filepath):
+        """Guardar estado (checkpoint)"""
+        directorio = os.path.dirname(filepath)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        
+        estado = {
+            'target_col': self.target_col,
+            'por': self.por,
+            'series': self.series
+        }
+        
+        with open(filepath, 'wb') as f:
+            pickle.dump(estado, f)
+    
+    @classmethod
+    def load(cls, filepath):
+        """Cargar estado (checkpoint)"""
+        with open(filepath, 'rb') as f:
+            estado = pickle.load(f)
+        
+        motor = cls(estado['target_col'], estado['por'])
+        motor.series = estado['series']
+        
+        return motor
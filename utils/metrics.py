@@ -1,67 +1,81 @@
 # utils/metrics.py
 import pandas as pd
 import numpy as np
+import streamlit as st
+
+from utils.data_loader import clave_datos
 
 def calcular_metricas_anuales(df, año):
-    """Métricas ejecutivas anuales"""
-    df_año = df[df['año'] == año]
+    """Métricas ejecutivas anuales (sin clave de caché: solo las filas del año de df)"""
+    if clave_datos(df) is None:
+        metricas = _metricas_año(df, año)
+    else:
+        metricas = consultar_metricas_anuales(get_metricas_anuales(df), año)
     
-    if len(df_año) == 0:
+    if metricas is None:
         return None
     
     return {
-        'ventas_totales': df_año['venta_pesos'].sum(),
-        'unidades_totales': df_año['cantidad_vendida_diaria'].sum(),
-        'ticket_promedio': df_año['venta_pesos'].sum() / max(len(df_año['fecha'].unique()), 1),
-        'dias_operacion': df_año['fecha'].nunique(),
-        'productos_activos': df_año['producto'].nunique(),
-        'ventas_promedio_dia': df_año.groupby('fecha')['venta_pesos'].sum().mean(),
-        'mejor_mes': df_año.groupby('mes')['venta_pesos'].sum().idxmax() if len(df_año) > 0 else None,
-        'peor_mes': df_año.groupby('mes')['venta_pesos'].sum().idxmin() if len(df_año) > 0 else None,
-        'producto_estrella': df_año.groupby('producto')['venta_pesos'].sum().idxmax() if len(df_año) > 0 else None,
+        'ventas_totales': metricas['ventas_totales'],
+        'unidades_totales': metricas['unidades_totales'],
+        'ticket_promedio': metricas['ticket_promedio'],
+        'dias_operacion': metricas['dias_operacion'],
+        'productos_activos': metricas['productos_activos'],
+        'ventas_promedio_dia': metricas['ventas_promedio_dia'],
+        'mejor_mes': metricas['mejor_mes'],
+        'peor_mes': metricas['peor_mes'],
+        'producto_estrella': metricas['producto_estrella'],
     }
 
 
 def calcular_metricas_mensuales(df, año, mes):
-    """Métricas del mes"""
-    df_mes = df[(df['año'] == año) & (df['mes'] == mes)]
-    
-    if len(df_mes) == 0:
-        return None
-    
-    # Mes anterior
-    if mes > 1:
-        df_mes_anterior = df[(df['año'] == año) & (df['mes'] == mes - 1)]
+    """Métricas del mes (sin clave de caché: solo el mes y el anterior de df)"""
+    if clave_datos(df) is None:
+        resumen = _resumen_mes(df, año, mes)
     else:
-        df_mes_anterior = df[(df['año'] == año - 1) & (df['mes'] == 12)]
+        resumen = consultar_resumen_mensual(get_resumen_mensual(df), año, mes)
     
-    ventas_mes = df_mes['venta_pesos'].sum()
-    ventas_anterior = df_mes_anterior['venta_pesos'].sum() if len(df_mes_anterior) > 0 else ventas_mes
+    if resumen is None:
+        return None
     
     return {
-        'ventas_totales': ventas_mes,
-        'cambio_vs_anterior': ((ventas_mes - ventas_anterior) / ventas_anterior * 100) if ventas_anterior > 0 else 0,
-        'dias_operacion': df_mes['fecha'].nunique(),
-        'ventas_promedio_dia': df_mes.groupby('fecha')['venta_pesos'].sum().mean(),
-        'mejor_dia': df_mes.groupby('fecha')['venta_pesos'].sum().idxmax() if len(df_mes) > 0 else None,
-        'peor_dia': df_mes.groupby('fecha')['venta_pesos'].sum().idxmin() if len(df_mes) > 0 else None,
-        'mejor_dia_semana': df_mes.groupby('dia_semana')['venta_pesos'].sum().idxmax() if len(df_mes) > 0 else None,
-        'top_3_productos': df_mes.groupby('producto')['venta_pesos'].sum().nlargest(3),
+        'ventas_totales': resumen['ventas_totales'],
+        'cambio_vs_anterior': resumen['cambio_vs_anterior'],
+        'dias_operacion': resumen['dias_operacion'],
+        'ventas_promedio_dia': resumen['ventas_promedio_dia'],
+        'mejor_dia': resumen['mejor_dia'],
+        'peor_dia': resumen['peor_dia'],
+        'mejor_dia_semana': resumen['mejor_dia_semana'],
+        'top_3_productos': resumen['top_productos'].head(3),
     }
 
 
 def calcular_metricas_diarias(df, fecha):
-    """Métricas del día específico"""
-    df_dia = df[df['fecha'] == pd.to_datetime(fecha)]
+    """Métricas del día específico
+    
+    Sobre el DataFrame de cargar_datos usa el índice de fechas y la línea
+    base cacheados; sobre cualquier otro calcula solo ese día y la media de
+    su día de la semana.
+    """
+    fecha = pd.Timestamp(fecha)
+    cacheado = clave_datos(df) is not None
+    
+    if cacheado:
+        df_dia = ventana_fechas(get_indice_fechas(df), *rango_fechas(fecha=fecha))
+    else:
+        df_dia = df[df['fecha'] == fecha]
     
     if len(df_dia) == 0:
         return None
     
-    dia_semana = pd.to_datetime(fecha).day_name()
-    df_dias_similares = df[df['dia_semana'] == dia_semana]
+    dia_semana = fecha.day_name()
+    if cacheado:
+        ventas_promedio_similar = consultar_linea_base(get_linea_base_semanal(df), dia_semana)['media']
+    else:
+        similares = df[df['dia_semana'] == dia_semana]
+        ventas_promedio_similar = similares.groupby('fecha', observed=True)['venta_pesos'].sum().mean()
     
     ventas_dia = df_dia['venta_pesos'].sum()
-    ventas_promedio_similar = df_dias_similares.groupby('fecha')['venta_pesos'].sum().mean()
     
     return {
         'ventas_totales': ventas_dia,
@@ -69,78 +83,825 @@ def calcular_metricas_diarias(df, fecha):
         'productos_vendidos': df_dia['producto'].nunique(),
         'ticket_promedio': ventas_dia / max(len(df_dia), 1),
         'vs_promedio_dia_similar': ((ventas_dia - ventas_promedio_similar) / ventas_promedio_similar * 100) if ventas_promedio_similar > 0 else 0,
-        'top_producto': df_dia.groupby('producto')['venta_pesos'].sum().idxmax() if len(df_dia) > 0 else 'N/A',
+        'top_producto': df_dia.groupby('producto', observed=True)['venta_pesos'].sum().idxmax() if len(df_dia) > 0 else 'N/A',
         'tiene_evento': df_dia['tiene_evento'].max() if len(df_dia) > 0 else 0,
-        'restaurante_lider': df_dia.groupby('restaurante')['venta_pesos'].sum().idxmax() if len(df_dia) > 0 else 'N/A'
+        'restaurante_lider': df_dia.groupby('restaurante', observed=True)['venta_pesos'].sum().idxmax() if len(df_dia) > 0 else 'N/A'
     }
 
 
 def calcular_top_productos(df, top_n=10):
     """Calcula top productos con métricas"""
-    productos = df.groupby('producto').agg({
+    productos = df.groupby('producto', observed=True).agg({
         'venta_pesos': 'sum',
         'cantidad_vendida_diaria': 'sum',
         'fecha': 'count'
     }).rename(columns={'fecha': 'frecuencia'})
     
-    productos = productos.sort_values('venta_pesos', ascending=False).head(top_n)
+    productos = productos.iloc[posiciones_top_k(productos['venta_pesos'], top_n)]
     productos['ticket_promedio'] = productos['venta_pesos'] / productos['cantidad_vendida_diaria']
     
     return productos
 
 
+def regresion_por_grupo(y, grupos):
+    """Pendiente y R² OLS de y contra 0, 1, ..., n-1 dentro de cada grupo
+    
+    Forma cerrada de linregress(np.arange(n), y): con x centrada, Σx = 0 y
+    Σx² = n(n² - 1) / 12, así que bastan sumas agrupadas. `y` debe venir
+    ordenada dentro de cada grupo.
+    """
+    agrupado = y.groupby(grupos, observed=True, sort=False)
+    n = agrupado.transform('size')
+    x_centrada = agrupado.cumcount() - (n - 1) / 2
+    y_centrada = y - agrupado.transform('mean')
+    
+    sxy = (x_centrada * y).groupby(grupos, observed=True).sum()
+    syy = (y_centrada ** 2).groupby(grupos, observed=True).sum()
+    n = agrupado.size()
+    sxx = n * (n ** 2 - 1) / 12
+    
+    # Como linregress: r = 0 si x o y son constantes
+    r = (sxy / np.sqrt(sxx * syy)).where((sxx > 0) & (syy > 0), 0).clip(-1, 1)
+    
+    return pd.DataFrame({'pendiente': sxy / sxx, 'r2': r ** 2})
+
+
 def calcular_productos_riesgo(df, top_n=10):
-    """Identifica productos en riesgo"""
-    from scipy import stats
+    """Identifica productos en riesgo
     
-    productos_riesgo = []
+    Una sola pasada agrupada por producto (lineal en filas): ventas totales
+    y de los últimos 30 días de cada producto, tendencia de las unidades
+    diarias (pendiente OLS en forma cerrada), su variabilidad y la cobertura
+    de días.
+    """
+    dias_totales = df['fecha'].nunique()
     
-    for producto in df['producto'].unique():
-        df_prod = df[df['producto'] == producto]
-        
-        if len(df_prod) < 10:  # Muy poco histórico
-            continue
-        
-        ventas_total = df_prod['venta_pesos'].sum()
-        fecha_max = df_prod['fecha'].max()
-        fecha_hace_30 = fecha_max - pd.Timedelta(days=30)
-        
-        df_reciente = df_prod[df_prod['fecha'] >= fecha_hace_30]
-        ventas_recientes = df_reciente['venta_pesos'].sum()
-        
-        # Calcular tendencia
-        ventas_diarias = df_prod.groupby('fecha')['cantidad_vendida_diaria'].sum().reset_index()
-        if len(ventas_diarias) >= 5:
-            x = np.arange(len(ventas_diarias))
-            y = ventas_diarias['cantidad_vendida_diaria'].values
-            slope, _, _, _, _ = stats.linregress(x, y)
-            tendencia = slope
-        else:
-            tendencia = 0
-        
-        # Score de riesgo
-        score_riesgo = 0
-        
-        if tendencia < 0:
-            score_riesgo += 30
-        
-        if ventas_recientes < ventas_total * 0.15:
-            score_riesgo += 25
+    df = df[df['producto'].notna()]
+    por_producto = df.groupby('producto', observed=True)
+    
+    productos = pd.DataFrame({
+        'filas': por_producto.size(),
+        'ventas_total': por_producto['venta_pesos'].sum(),
+        'cantidad_media': por_producto['cantidad_vendida_diaria'].mean()
+    })
+    
+    # Ventas de los últimos 30 días de cada producto
+    fecha_max = por_producto['fecha'].transform('max')
+    reciente = df['fecha'] >= fecha_max - pd.Timedelta(days=30)
+    productos['ventas_recientes'] = df['venta_pesos'].where(reciente, 0).groupby(df['producto'], observed=True).sum()
+    
+    # Unidades diarias: tendencia y variabilidad
+    diario = df.groupby(['producto', 'fecha'], observed=True)['cantidad_vendida_diaria'].sum()
+    productos_diario = diario.index.get_level_values('producto')
+    dias = diario.groupby(productos_diario, observed=True).size()
+    
+    productos['tendencia'] = regresion_por_grupo(diario, productos_diario)['pendiente'].where(dias >= 5, 0)
+    productos['varianza'] = diario.groupby(productos_diario, observed=True).std()
+    
+    # Score de riesgo
+    productos['score_riesgo'] = (
+        (productos['tendencia'] < 0) * 30
+        + (productos['ventas_recientes'] < productos['ventas_total'] * 0.15) * 25
+        + (productos['varianza'] > productos['cantidad_media']) * 20
+        + (productos['filas'] < dias_totales * 0.3) * 25
+    )
+    
+    # Mismo orden de aparición que el recorrido por producto (define los empates)
+    orden = df['producto'].drop_duplicates()
+    productos = productos.reindex(orden)
+    productos = productos[productos['filas'] >= 10]  # Muy poco histórico
+    
+    df_riesgo = pd.DataFrame({
+        'producto': productos.index.tolist(),
+        'score_riesgo': productos['score_riesgo'].to_numpy(),
+        'ventas_total': productos['ventas_total'].to_numpy(),
+        'ventas_recientes': productos['ventas_recientes'].to_numpy(),
+        'tendencia': productos['tendencia'].to_numpy()
+    })
+    df_riesgo = df_riesgo.sort_values('score_riesgo', ascending=False)
+    return df_riesgo.head(top_n)
+
+
+# ==========================================
+# ÍNDICE DE FECHAS (BÚSQUEDA BINARIA)
+# ==========================================
+
+def construir_indice_fechas(tabla):
+    """Índice de una tabla ordenada por fecha, global y por restaurante
+    
+    Las ventanas de fechas se resuelven con searchsorted (O(log N)) en lugar
+    de máscaras sobre toda la tabla. Sin filtro de restaurante la ventana es
+    un rango contiguo de filas (vista, sin copia); por restaurante se guardan
+    las posiciones de sus filas, también ordenadas por fecha.
+    """
+    if not tabla['fecha'].is_monotonic_increasing:
+        tabla = tabla.sort_values('fecha', kind='stable')
+    
+    fechas = tabla['fecha'].array
+    
+    por_restaurante = {}
+    if 'restaurante' in tabla.columns:
+        for restaurante, posiciones in tabla.groupby('restaurante', observed=True).indices.items():
+            por_restaurante[restaurante] = (posiciones, fechas[posiciones])
+    
+    return {'tabla': tabla, 'fechas': fechas, 'por_restaurante': por_restaurante}
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _indice_cacheado(_df, clave):
+    return construir_indice_fechas(_df)
+
+
+def get_indice_fechas(df):
+    """Índice de fechas de df (cacheado si df viene de cargar_datos)"""
+    clave = clave_datos(df)
+    if clave is None:
+        return construir_indice_fechas(df)
+    return _indice_cacheado(df, clave)
+
+
+def rango_fechas(año=None, mes=None, fecha=None, desde=None, hasta=None):
+    """Límites (desde, hasta) inclusivos para un año, un mes, un día o un rango"""
+    if fecha is not None:
+        desde = hasta = pd.Timestamp(fecha)
+    
+    if año is not None:
+        inicio = pd.Timestamp(year=int(año), month=int(mes) if mes is not None else 1, day=1)
+        fin = inicio + (pd.offsets.MonthEnd(0) if mes is not None else pd.offsets.YearEnd(0))
+        desde = inicio if desde is None else max(pd.Timestamp(desde), inicio)
+        hasta = fin if hasta is None else min(pd.Timestamp(hasta), fin)
+    
+    return desde, hasta
+
+
+def ventana_fechas(indice, desde=None, hasta=None, restaurante=None):
+    """Filas del índice con fecha en [desde, hasta] (y del restaurante dado)"""
+    tabla = indice['tabla']
+    
+    if restaurante is None:
+        fechas = indice['fechas']
+    elif restaurante in indice['por_restaurante']:
+        posiciones, fechas = indice['por_restaurante'][restaurante]
+    else:
+        return tabla.iloc[0:0]
+    
+    i = fechas.searchsorted(pd.Timestamp(desde), side='left') if desde is not None else 0
+    j = fechas.searchsorted(pd.Timestamp(hasta), side='right') if hasta is not None else len(fechas)
+    
+    if restaurante is None:
+        return tabla.iloc[i:j]
+    
+    return tabla.iloc[posiciones[i:j]]
+
+
+# ==========================================
+# CUBO DE VENTAS (AGREGADOS POR VERSIÓN DE DATOS)
+# ==========================================
+
+# Columnas de cargar_datos() que necesita el cubo
+COLUMNAS_CUBO = [
+    'fecha', 'año', 'mes', 'mes_nombre', 'dia_semana', 'es_fin_semana', 'restaurante',
+    'producto', 'venta_pesos', 'cantidad_vendida_diaria', 'tiene_evento'
+]
+
+COLUMNAS_CALENDARIO_CUBO = ['año', 'mes', 'mes_nombre', 'dia_semana', 'es_fin_semana']
+
+
+def _sumas(df, claves, **extra):
+    """Sumas de ventas y unidades y número de filas por las claves dadas"""
+    return df.groupby(claves, observed=True, sort=True, dropna=False).agg(
+        venta_pesos=('venta_pesos', 'sum'),
+        cantidad_vendida_diaria=('cantidad_vendida_diaria', 'sum'),
+        filas=('venta_pesos', 'size'),
+        **extra
+    ).reset_index()
+
+
+def construir_cubo(df):
+    """Cubo de ventas: agregados que usan todas las páginas
+    
+    - diario_producto: fecha × restaurante × producto (producto NaN = filas
+      sin código, para que los totales cuadren), con `venta_m2` (suma de
+      desviaciones al cuadrado de las filas) para reconstruir desviaciones
+      estándar a nivel de fila al combinar celdas, y `primera_fila` (posición
+      de su primera fila en df) para recorrer productos en el orden original.
+    - diario: fecha × restaurante, con tiene_evento.
+    - mensual, dia_semana: roll-ups de `diario` por mes y por día de la semana.
+    
+    Todas las tablas llevan las columnas de calendario para filtrar por año,
+    mes o día de la semana sin volver a las filas originales; las de grano
+    diario tienen además un índice de fechas (ver filtrar_cubo).
+    """
+    calendario = df.drop_duplicates('fecha').set_index('fecha')[COLUMNAS_CALENDARIO_CUBO].sort_index()
+    
+    claves = ['fecha', 'restaurante', 'producto']
+    media_celda = df.groupby(claves, observed=True, dropna=False)['venta_pesos'].transform('mean')
+    
+    diario_producto = _sumas(
+        df.assign(venta_m2=(df['venta_pesos'] - media_celda) ** 2, primera_fila=np.arange(len(df))), claves,
+        venta_m2=('venta_m2', 'sum'),
+        primera_fila=('primera_fila', 'min')
+    )
+    
+    diario = _sumas(df, ['fecha', 'restaurante'], tiene_evento=('tiene_evento', 'max'))
+    
+    for tabla in (diario_producto, diario):
+        for col in COLUMNAS_CALENDARIO_CUBO:
+            tabla[col] = calendario[col].reindex(tabla['fecha']).array
+    
+    medidas = {
+        'venta_pesos': ('venta_pesos', 'sum'),
+        'cantidad_vendida_diaria': ('cantidad_vendida_diaria', 'sum'),
+        'filas': ('filas', 'sum'),
+        'dias': ('fecha', 'nunique')
+    }
+    
+    mensual = diario.groupby(['año', 'mes', 'mes_nombre', 'restaurante'], observed=True).agg(**medidas).reset_index()
+    dia_semana = diario.groupby(['año', 'mes', 'dia_semana', 'restaurante'], observed=True).agg(**medidas).reset_index()
+    
+    return {
+        'diario_producto': diario_producto,
+        'diario': diario,
+        'mensual': mensual,
+        'dia_semana': dia_semana,
+        'indices': {
+            'diario_producto': construir_indice_fechas(diario_producto),
+            'diario': construir_indice_fechas(diario)
+        }
+    }
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _cubo_cacheado(_df, clave):
+    return construir_cubo(_df)
+
+
+def get_cubo_ventas(df):
+    """Cubo de ventas de df (cacheado si df viene de cargar_datos)"""
+    clave = clave_datos(df)
+    if clave is None:
+        return construir_cubo(df)
+    return _cubo_cacheado(df, clave)
+
+
+def filtrar_cubo(cubo, nombre, año=None, mes=None, fecha=None, desde=None, hasta=None,
+                 restaurante=None, **filtros):
+    """Filas de la tabla `nombre` del cubo que cumplen los filtros (None = todos)
+    
+    En las tablas de grano diario la ventana de fechas (año, mes, fecha o
+    desde/hasta) y el restaurante se resuelven con el índice de fechas; el
+    resto de filtros columna=valor (y `mes` sin `año`, que no es una
+    ventana) se aplican como máscara sobre la ventana.
+    """
+    indice = cubo['indices'].get(nombre)
+    
+    if indice is not None:
+        if año is None:
+            filtros['mes'], mes = mes, None
+        tabla = ventana_fechas(indice, *rango_fechas(año, mes, fecha, desde, hasta), restaurante=restaurante)
+    else:
+        tabla = cubo[nombre]
+        filtros.update({'año': año, 'mes': mes, 'restaurante': restaurante})
+    
+    filtros = {col: valor for col, valor in filtros.items() if valor is not None}
+    if not filtros:
+        return tabla
+    
+    mascara = np.ones(len(tabla), dtype=bool)
+    for col, valor in filtros.items():
+        mascara &= (tabla[col] == valor).to_numpy()
+    
+    return tabla[mascara]
+
+
+def resumir_productos(diario_producto):
+    """Totales por producto a partir de celdas del cubo
+    
+    Media y desviación estándar son a nivel de fila original (como un
+    groupby('producto') sobre los datos crudos): la desviación se combina
+    desde `venta_m2` de cada celda.
+    """
+    celdas = diario_producto[diario_producto['producto'].notna()]
+    
+    productos = celdas.groupby('producto', observed=True).agg(
+        venta_pesos=('venta_pesos', 'sum'),
+        cantidad_vendida_diaria=('cantidad_vendida_diaria', 'sum'),
+        filas=('filas', 'sum')
+    )
+    
+    # Varianza combinada: M2 = Σ M2_celda + Σ n_celda · (media_celda - media)²
+    media = productos['venta_pesos'] / productos['filas']
+    media_celda = celdas['venta_pesos'] / celdas['filas']
+    desvio = (media_celda - media.reindex(celdas['producto']).to_numpy()) ** 2 * celdas['filas']
+    m2 = (celdas['venta_m2'] + desvio).groupby(celdas['producto'], observed=True).sum()
+    
+    productos['venta_promedio'] = media
+    productos['venta_std'] = np.sqrt(m2 / (productos['filas'] - 1)).where(productos['filas'] > 1)
+    productos['cantidad_promedio'] = productos['cantidad_vendida_diaria'] / productos['filas']
+    
+    return productos
+
+
+# ==========================================
+# TABLA DE RIESGO (PRECALCULADA)
+# ==========================================
+
+UMBRALES_RIESGO = (30, 60, 90)
+
+COLUMNAS_RIESGO = [
+    'producto', 'ventas_total', 'ventas_recientes', 'venta_prom_historico', 'venta_prom_reciente',
+    'caida_reciente_%', 'tendencia', 'r_squared', 'cv_%', 'frecuencia_%', 'dias_sin_venta',
+    'score_riesgo', 'nivel_riesgo'
+]
+
+
+def _riesgo_por_umbral(celdas, diario, umbrales):
+    """Indicadores y score de riesgo por producto de un corte del cubo
+    
+    Genera (umbral, tabla) para cada umbral de días recientes. Tendencia,
+    variabilidad y frecuencia no dependen del umbral y se calculan una vez.
+    Productos en orden de aparición en los datos (índice 0..n-1) y tabla
+    ordenada por score, con los empates en ese orden.
+    """
+    celdas = celdas[celdas['producto'].notna()]
+    fecha_max = diario['fecha'].max()
+    dias_disponibles = diario['fecha'].nunique()
+    
+    productos = celdas.groupby('producto', observed=True).agg(
+        ventas_total=('venta_pesos', 'sum'),
+        dias_total=('filas', 'sum'),
+        primera_fila=('primera_fila', 'min')
+    )
+    productos = productos.sort_values('primera_fila')
+    productos = productos[productos['dias_total'] >= 10]  # Muy poco histórico
+    
+    # 1. Tendencia, 3. variabilidad y 4. frecuencia sobre las ventas diarias
+    ventas_diarias = celdas.groupby(['producto', 'fecha'], observed=True)['venta_pesos'].sum()
+    grupos = ventas_diarias.index.get_level_values('producto')
+    por_dia = ventas_diarias.groupby(grupos, observed=True)
+    dias_venta = por_dia.size()
+    
+    regresion = regresion_por_grupo(ventas_diarias, grupos)
+    regresion.loc[dias_venta < 5] = 0
+    media = por_dia.mean()
+    cv = (por_dia.std() / media * 100).where(media > 0, 0)
+    
+    tendencia = regresion['pendiente'].reindex(productos.index).to_numpy()
+    r_squared = regresion['r2'].reindex(productos.index).to_numpy()
+    cv = cv.reindex(productos.index).to_numpy()
+    frecuencia = (dias_venta / dias_disponibles * 100).reindex(productos.index).to_numpy()
+    
+    ventas_total = productos['ventas_total'].to_numpy()
+    venta_prom_historico = ventas_total / productos['dias_total'].to_numpy()
+    nombres = productos.index.tolist()
+    
+    for umbral in umbrales:
+        # 2. Ventas recientes vs histórico y 5. días sin venta
+        recientes = celdas[celdas['fecha'] >= fecha_max - pd.Timedelta(days=umbral)]
+        recientes = recientes.groupby('producto', observed=True).agg(
+            ventas=('venta_pesos', 'sum'),
+            dias=('filas', 'sum')
+        ).reindex(productos.index, fill_value=0)
         
-        varianza = df_prod.groupby('fecha')['cantidad_vendida_diaria'].sum().std()
-        if varianza > df_prod['cantidad_vendida_diaria'].mean():
-            score_riesgo += 20
+        ventas_recientes = recientes['ventas'].to_numpy(dtype=float)
+        dias_recientes = recientes['dias'].to_numpy()
+        venta_prom_reciente = ventas_recientes / np.maximum(dias_recientes, 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            caida = np.where(
+                venta_prom_historico > 0,
+                (venta_prom_historico - venta_prom_reciente) / venta_prom_historico * 100,
+                0
+            )
+        dias_sin_venta = umbral - dias_recientes
         
-        if len(df_prod) < len(df['fecha'].unique()) * 0.3:
-            score_riesgo += 25
+        # Score de riesgo (0-100, mayor = más riesgo)
+        score = np.zeros(len(productos))
+        score += np.where(tendencia < 0, np.minimum(np.abs(tendencia) / 10000, 30), 0)
+        score += np.where(caida > 0, np.minimum(caida / 4, 25), 0)
+        score += np.where(cv > 50, np.minimum((cv - 50) / 5, 20), 0)
+        score += np.where(frecuencia < 50, np.minimum((50 - frecuencia) / 3.33, 15), 0)
+        score += np.where(dias_sin_venta > 0, np.minimum(dias_sin_venta / 3, 10), 0)
         
-        productos_riesgo.append({
-            'producto': producto,
-            'score_riesgo': score_riesgo,
+        riesgo = pd.DataFrame({
+            'producto': nombres,
             'ventas_total': ventas_total,
             'ventas_recientes': ventas_recientes,
-            'tendencia': tendencia
-        })
+            'venta_prom_historico': venta_prom_historico,
+            'venta_prom_reciente': venta_prom_reciente,
+            'caida_reciente_%': caida,
+            'tendencia': tendencia,
+            'r_squared': r_squared,
+            'cv_%': cv,
+            'frecuencia_%': frecuencia,
+            'dias_sin_venta': dias_sin_venta,
+            'score_riesgo': score
+        }).sort_values('score_riesgo', ascending=False)
+        
+        score = riesgo['score_riesgo']
+        riesgo['nivel_riesgo'] = np.select([score >= 60, score >= 30], ['Alto', 'Medio'], 'Bajo')
+        
+        yield umbral, riesgo
+
+
+def construir_tabla_riesgo(cubo, umbrales=UMBRALES_RIESGO):
+    """Riesgo de todos los productos para cada año × restaurante × umbral
     
-    df_riesgo = pd.DataFrame(productos_riesgo).sort_values('score_riesgo', ascending=False)
-    return df_riesgo.head(top_n)
+    Incluye 'Todos' (None) en año y restaurante. Devuelve la tabla compacta
+    con las claves como columnas y `posiciones`: (año, restaurante, umbral)
+    → rango de filas, para que consultar_riesgo sea una búsqueda directa.
+    """
+    años = [None] + sorted(cubo['mensual']['año'].unique().tolist())
+    restaurantes = [None] + sorted(cubo['mensual']['restaurante'].unique().tolist())
+    
+    partes = []
+    posiciones = {}
+    inicio = 0
+    
+    for año in años:
+        for restaurante in restaurantes:
+            diario = filtrar_cubo(cubo, 'diario', año=año, restaurante=restaurante)
+            if len(diario) == 0:
+                continue
+            celdas = filtrar_cubo(cubo, 'diario_producto', año=año, restaurante=restaurante)
+            
+            for umbral, riesgo in _riesgo_por_umbral(celdas, diario, umbrales):
+                posiciones[(año, restaurante, umbral)] = (inicio, inicio + len(riesgo))
+                inicio += len(riesgo)
+                partes.append(riesgo.assign(año=año, restaurante=restaurante, umbral_dias=umbral))
+    
+    tabla = pd.concat(partes) if partes else pd.DataFrame(columns=COLUMNAS_RIESGO)
+    
+    return {'tabla': tabla, 'posiciones': posiciones}
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _tabla_riesgo_cacheada(_df, clave):
+    return construir_tabla_riesgo(get_cubo_ventas(_df))
+
+
+def get_tabla_riesgo(df):
+    """Tabla de riesgo de df (cacheada si df viene de cargar_datos)"""
+    clave = clave_datos(df)
+    if clave is None:
+        return construir_tabla_riesgo(get_cubo_ventas(df))
+    return _tabla_riesgo_cacheada(df, clave)
+
+
+def consultar_riesgo(tabla_riesgo, año=None, restaurante=None, umbral_dias=60):
+    """Productos de riesgo de un año, restaurante y umbral (None = todos)
+    
+    Filas en el orden de la tabla (score descendente) con el índice de
+    posición de cada producto en su corte.
+    """
+    inicio, fin = tabla_riesgo['posiciones'].get((año, restaurante, umbral_dias), (0, 0))
+    return tabla_riesgo['tabla'].iloc[inicio:fin][COLUMNAS_RIESGO]
+
+
+# ==========================================
+# LÍNEA BASE POR DÍA DE LA SEMANA
+# ==========================================
+
+def _resumir_dias_semana(totales, ambito, ultimos):
+    """Resumen por día de la semana de una serie de totales diarios ordenada por fecha"""
+    resumen = {}
+    for dia, serie in totales['venta_pesos'].groupby(totales['dia_semana'], observed=True):
+        resumen[(ambito, dia)] = {
+            'dias': len(serie),
+            'suma': serie.sum(),
+            'media': serie.mean(),
+            'totales': serie,
+            'ultimos': serie.tail(ultimos)
+        }
+    return resumen
+
+
+def construir_linea_base_semanal(diario, ultimos=5):
+    """Línea base de "días similares" a partir de la tabla diaria del cubo
+    
+    Para cada restaurante (None = todos juntos) y día de la semana guarda
+    los totales diarios en orden de fecha, su suma, número de días y media,
+    y los `ultimos` totales más recientes.
+    """
+    diario = diario.sort_values('fecha', kind='stable')
+    
+    todos = diario.groupby('fecha', observed=True).agg(
+        venta_pesos=('venta_pesos', 'sum'),
+        dia_semana=('dia_semana', 'first')
+    )
+    linea_base = _resumir_dias_semana(todos, None, ultimos)
+    
+    for restaurante, tabla in diario.groupby('restaurante', observed=True):
+        linea_base.update(_resumir_dias_semana(tabla.set_index('fecha'), restaurante, ultimos))
+    
+    return linea_base
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _linea_base_cacheada(_df, clave):
+    return construir_linea_base_semanal(get_cubo_ventas(_df)['diario'])
+
+
+def get_linea_base_semanal(df):
+    """Línea base por día de la semana de df (cacheada si df viene de cargar_datos)"""
+    clave = clave_datos(df)
+    if clave is None:
+        return construir_linea_base_semanal(get_cubo_ventas(df)['diario'])
+    return _linea_base_cacheada(df, clave)
+
+
+def consultar_linea_base(linea_base, dia_semana, restaurante=None):
+    """Resumen de los días `dia_semana` de un restaurante (None = todos)"""
+    vacio = pd.Series(dtype=float, index=pd.DatetimeIndex([], name='fecha'), name='venta_pesos')
+    return linea_base.get((restaurante, dia_semana), {
+        'dias': 0, 'suma': 0.0, 'media': np.nan, 'totales': vacio, 'ultimos': vacio
+    })
+
+
+# ==========================================
+# RESUMEN MENSUAL
+# ==========================================
+
+def _ambitos_restaurante(cubo):
+    """(restaurante, totales diarios, celdas de producto) para todos juntos (None) y cada restaurante"""
+    diario = cubo['diario']
+    celdas = cubo['diario_producto']
+    
+    todos = diario.groupby('fecha', observed=True).agg(
+        año=('año', 'first'),
+        mes=('mes', 'first'),
+        dia_semana=('dia_semana', 'first'),
+        venta_pesos=('venta_pesos', 'sum'),
+        cantidad_vendida_diaria=('cantidad_vendida_diaria', 'sum')
+    ).reset_index()
+    
+    ambitos = [(None, todos, celdas)]
+    celdas_restaurante = dict(list(celdas.groupby('restaurante', observed=True)))
+    for restaurante, tabla in diario.groupby('restaurante', observed=True):
+        ambitos.append((restaurante, tabla, celdas_restaurante[restaurante]))
+    
+    return ambitos
+
+
+def _resumir_meses(dias, celdas, top_k):
+    """Resumen por año × mes de totales diarios (una fila por fecha) y sus celdas de producto"""
+    dias = dias.sort_values('fecha', kind='stable', ignore_index=True)
+    por_mes = dias.groupby(['año', 'mes'], observed=True)
+    
+    resumen = por_mes.agg(
+        ventas_totales=('venta_pesos', 'sum'),
+        dias_operacion=('fecha', 'nunique'),
+        ventas_promedio_dia=('venta_pesos', 'mean'),
+        venta_mejor_dia=('venta_pesos', 'max'),
+        venta_peor_dia=('venta_pesos', 'min')
+    )
+    resumen['mejor_dia'] = dias['fecha'].to_numpy()[por_mes['venta_pesos'].idxmax().to_numpy()]
+    resumen['peor_dia'] = dias['fecha'].to_numpy()[por_mes['venta_pesos'].idxmin().to_numpy()]
+    
+    # Mejor día de la semana (empates: el primero, como idxmax)
+    por_dia_semana = dias.groupby(['año', 'mes', 'dia_semana'], observed=True)['venta_pesos'].sum().reset_index()
+    mejor = por_dia_semana.sort_values('venta_pesos', ascending=False, kind='stable').drop_duplicates(['año', 'mes'])
+    resumen['mejor_dia_semana'] = mejor.set_index(['año', 'mes'])['dia_semana'].reindex(resumen.index)
+    
+    # Mes anterior, con el cambio de año en enero
+    año = resumen.index.get_level_values('año').to_numpy()
+    mes = resumen.index.get_level_values('mes').to_numpy()
+    previo = pd.MultiIndex.from_arrays([año - (mes == 1), np.where(mes == 1, 12, mes - 1)])
+    anterior = resumen['ventas_totales'].reindex(previo).fillna(0).to_numpy()
+    
+    resumen['ventas_mes_anterior'] = anterior
+    with np.errstate(divide='ignore', invalid='ignore'):
+        resumen['cambio_vs_anterior'] = np.where(
+            anterior > 0, (resumen['ventas_totales'] - anterior) / anterior * 100, 0
+        )
+    
+    # Top productos (empates en el orden de nlargest)
+    celdas = celdas[celdas['producto'].notna()]
+    ventas_producto = celdas.groupby(['año', 'mes', 'producto'], observed=True)['venta_pesos'].sum().reset_index()
+    top = ventas_producto.sort_values('venta_pesos', ascending=False, kind='stable').groupby(['año', 'mes']).head(top_k)
+    top_productos = {
+        clave: grupo.set_index('producto')['venta_pesos']
+        for clave, grupo in top.groupby(['año', 'mes'], observed=True)
+    }
+    vacio = pd.Series(dtype=float, name='venta_pesos')
+    resumen['top_productos'] = [top_productos.get(clave, vacio) for clave in resumen.index]
+    
+    return resumen
+
+
+def construir_resumen_mensual(cubo, top_k=5):
+    """Tabla de hechos mensual por restaurante y para todos juntos (None)
+    
+    Una fila por año × mes × restaurante con ventas, días de operación,
+    venta promedio por día, mejor y peor día, mejor día de la semana, los
+    `top_k` productos y la variación contra el mes anterior (enero contra
+    diciembre del año previo). `posiciones` lleva cada clave a su fila.
+    """
+    partes = []
+    posiciones = {}
+    for restaurante, dias, celdas_ambito in _ambitos_restaurante(cubo):
+        resumen = _resumir_meses(dias, celdas_ambito, top_k)
+        for año, mes in resumen.index:
+            posiciones[(int(año), int(mes), restaurante)] = len(posiciones)
+        partes.append(resumen.reset_index().assign(restaurante=restaurante))
+    
+    return {'tabla': pd.concat(partes, ignore_index=True), 'posiciones': posiciones}
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _resumen_mensual_cacheado(_df, clave):
+    return construir_resumen_mensual(get_cubo_ventas(_df))
+
+
+def get_resumen_mensual(df):
+    """Resumen mensual de df (cacheado si df viene de cargar_datos)"""
+    clave = clave_datos(df)
+    if clave is None:
+        return construir_resumen_mensual(get_cubo_ventas(df))
+    return _resumen_mensual_cacheado(df, clave)
+
+
+def _resumen_mes(df, año, mes, top_k=5):
+    """Resumen de un mes (como una fila de construir_resumen_mensual) calculado sobre df, sin caché
+    
+    Solo agrega las filas del mes y el total del mes anterior: para
+    consultas sueltas sobre DataFrames que no vienen de cargar_datos.
+    """
+    df_mes = df[(df['año'] == año) & (df['mes'] == mes)]
+    
+    if len(df_mes) == 0:
+        return None
+    
+    año_anterior, mes_anterior = (año - 1, 12) if mes == 1 else (año, mes - 1)
+    anterior = df.loc[(df['año'] == año_anterior) & (df['mes'] == mes_anterior), 'venta_pesos'].sum()
+    
+    por_dia = df_mes.groupby('fecha', observed=True)['venta_pesos'].sum()
+    por_dia_semana = df_mes.groupby('dia_semana', observed=True)['venta_pesos'].sum()
+    por_producto = df_mes.groupby('producto', observed=True)['venta_pesos'].sum()
+    ventas = por_dia.sum()
+    
+    return {
+        'ventas_totales': ventas,
+        'dias_operacion': len(por_dia),
+        'ventas_promedio_dia': por_dia.mean(),
+        'venta_mejor_dia': por_dia.max(),
+        'venta_peor_dia': por_dia.min(),
+        'mejor_dia': por_dia.idxmax(),
+        'peor_dia': por_dia.idxmin(),
+        'mejor_dia_semana': por_dia_semana.idxmax(),
+        'ventas_mes_anterior': anterior,
+        'cambio_vs_anterior': (ventas - anterior) / anterior * 100 if anterior > 0 else 0,
+        'top_productos': por_producto.iloc[posiciones_top_k(por_producto.to_numpy(), top_k)]
+    }
+
+
+def consultar_resumen_mensual(resumen, año, mes, restaurante=None):
+    """Fila del resumen de un mes y restaurante (None = todos), o None si no hay datos"""
+    posicion = resumen['posiciones'].get((año, mes, restaurante))
+    if posicion is None:
+        return None
+    return resumen['tabla'].iloc[posicion]
+
+
+# ==========================================
+# MÉTRICAS ANUALES (TODOS LOS AÑOS)
+# ==========================================
+
+def _primero_por_año(tabla, columna, ascendente=False):
+    """Valor de `columna` en la fila de mayor (o menor) venta de cada año; empates: la primera"""
+    orden = tabla.sort_values('venta_pesos', ascending=ascendente, kind='stable')
+    return orden.drop_duplicates('año').set_index('año')[columna]
+
+
+def _resumir_años(dias, celdas):
+    """Métricas por año de totales diarios (una fila por fecha) y sus celdas de producto"""
+    por_año = dias.groupby('año', observed=True)
+    
+    metricas = por_año.agg(
+        ventas_totales=('venta_pesos', 'sum'),
+        unidades_totales=('cantidad_vendida_diaria', 'sum'),
+        dias_operacion=('fecha', 'nunique'),
+        ventas_promedio_dia=('venta_pesos', 'mean')
+    )
+    metricas['ticket_promedio'] = metricas['ventas_totales'] / metricas['dias_operacion'].clip(lower=1)
+    
+    por_mes = dias.groupby(['año', 'mes'], observed=True)['venta_pesos'].sum().reset_index()
+    metricas['mejor_mes'] = _primero_por_año(por_mes, 'mes')
+    metricas['peor_mes'] = _primero_por_año(por_mes, 'mes', ascendente=True)
+    
+    celdas = celdas[celdas['producto'].notna()]
+    por_producto = celdas.groupby(['año', 'producto'], observed=True)['venta_pesos'].sum().reset_index()
+    metricas['productos_activos'] = por_producto.groupby('año').size().reindex(metricas.index, fill_value=0)
+    metricas['producto_estrella'] = _primero_por_año(por_producto, 'producto').astype(object)
+    
+    # Comparación con el año anterior
+    anterior = metricas['ventas_totales'].reindex(metricas.index - 1).fillna(0).to_numpy()
+    metricas['ventas_año_anterior'] = anterior
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metricas['crecimiento_vs_anterior'] = np.where(
+            anterior > 0, (metricas['ventas_totales'] - anterior) / anterior * 100, 0
+        )
+    
+    return metricas
+
+
+def construir_metricas_anuales(cubo):
+    """Métricas anuales de todos los años, por restaurante y para todos juntos (None)
+    
+    Una fila por año × restaurante con las métricas de calcular_metricas_anuales
+    y el crecimiento contra el año anterior. `posiciones` lleva cada clave a su fila.
+    """
+    partes = []
+    posiciones = {}
+    for restaurante, dias, celdas_ambito in _ambitos_restaurante(cubo):
+        metricas = _resumir_años(dias, celdas_ambito)
+        for año in metricas.index:
+            posiciones[(int(año), restaurante)] = len(posiciones)
+        partes.append(metricas.reset_index().assign(restaurante=restaurante))
+    
+    return {'tabla': pd.concat(partes, ignore_index=True), 'posiciones': posiciones}
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _metricas_anuales_cacheadas(_df, clave):
+    return construir_metricas_anuales(get_cubo_ventas(_df))
+
+
+def get_metricas_anuales(df):
+    """Métricas anuales de df (cacheadas si df viene de cargar_datos)"""
+    clave = clave_datos(df)
+    if clave is None:
+        return construir_metricas_anuales(get_cubo_ventas(df))
+    return _metricas_anuales_cacheadas(df, clave)
+
+
+def _metricas_año(df, año):
+    """Métricas de un año (como una fila de construir_metricas_anuales) calculadas sobre df, sin caché"""
+    df_año = df[df['año'] == año]
+    
+    if len(df_año) == 0:
+        return None
+    
+    por_dia = df_año.groupby('fecha', observed=True)['venta_pesos'].sum()
+    por_mes = df_año.groupby('mes', observed=True)['venta_pesos'].sum()
+    por_producto = df_año.groupby('producto', observed=True)['venta_pesos'].sum()
+    ventas = por_dia.sum()
+    
+    return {
+        'ventas_totales': ventas,
+        'unidades_totales': df_año['cantidad_vendida_diaria'].sum(),
+        'ticket_promedio': ventas / max(len(por_dia), 1),
+        'dias_operacion': len(por_dia),
+        'productos_activos': len(por_producto),
+        'ventas_promedio_dia': por_dia.mean(),
+        'mejor_mes': por_mes.idxmax(),
+        'peor_mes': por_mes.idxmin(),
+        'producto_estrella': por_producto.idxmax() if len(por_producto) > 0 else None,
+    }
+
+
+def consultar_metricas_anuales(metricas, año, restaurante=None):
+    """Fila de métricas de un año y restaurante (None = todos), o None si no hay datos"""
+    posicion = metricas['posiciones'].get((int(año), restaurante))
+    if posicion is None:
+        return None
+    return metricas['tabla'].iloc[posicion]
+
+
+# ==========================================
+# TOP-K (SELECCIÓN PARCIAL)
+# ==========================================
+
+def posiciones_top_k(valores, k, ascendente=False, desempate=None):
+    """Posiciones de los k valores mayores (o menores), en orden
+    
+    Igual que nlargest(k) / nsmallest(k): los NaN solo completan el final
+    si faltan valores y en los empates gana la posición menor, salvo que se
+    pase `desempate` (valores secundarios, mayor primero). Usa selección parcial (np.partition): O(n + k log k) en
+    vez de ordenar todos los valores.
+    """
+    valores = np.asarray(valores, dtype=float)
+    nulos = np.isnan(valores)
+    validas = np.flatnonzero(~nulos)
+    clave = valores[validas] if ascendente else -valores[validas]
+    relleno = np.flatnonzero(nulos)[:max(k - len(clave), 0)]
+    k = max(min(k, len(clave)), 0)
+    
+    if k < len(clave):
+        corte = np.partition(clave, k - 1)[k - 1] if k > 0 else -np.inf
+        dentro = np.flatnonzero(clave < corte)
+        empatados = np.flatnonzero(clave == corte)
+        faltan = k - len(dentro)
+        if desempate is not None:
+            secundario = np.nan_to_num(np.asarray(desempate, dtype=float)[validas[empatados]], nan=-np.inf)
+            empatados = empatados[np.sort(posiciones_top_k(secundario, faltan))]
+        elegidos = np.concatenate([dentro, empatados[:faltan]])
+    else:
+        elegidos = np.arange(len(clave))
+    
+    if desempate is None:
+        orden = np.lexsort((elegidos, clave[elegidos]))
+    else:
+        secundario = -np.nan_to_num(np.asarray(desempate, dtype=float)[validas[elegidos]], nan=-np.inf)
+        orden = np.lexsort((elegidos, secundario, clave[elegidos]))
+    
+    return np.concatenate([validas[elegidos[orden]], relleno])
@@ -0,0 +1,268 @@
+# utils/metrics_polars.py
+"""
+Motor Polars para las métricas de utils.metrics
+
+Opcional: requiere `pip install polars`. Mismas funciones calcular_* que
+utils.metrics, para usar en su lugar. Las consultas son LazyFrames que
+Polars optimiza y agrupa en paralelo; el resultado se entrega en los mismos
+tipos que el motor pandas (escalares, Series y DataFrames de pandas), que
+es lo que consumen las gráficas.
+"""
+
+import pandas as pd
+import streamlit as st
+
+from utils.data_loader import cargar_datos_polars, clave_datos, get_version_actual, get_version_datos
+
+COLUMNAS_POLARS = [
+    'fecha', 'año', 'mes', 'dia_semana', 'restaurante', 'producto',
+    'venta_pesos', 'cantidad_vendida_diaria', 'tiene_evento'
+]
+
+# ==========================================
+# DATOS
+# ==========================================
+
+def _polars():
+    try:
+        import polars as pl
+    except ImportError as e:
+        raise ImportError("El motor Polars requiere polars: pip install polars") from e
+    return pl
+
+
+def preparar_frame(df):
+    """DataFrame de Polars con las columnas de COLUMNAS_POLARS listo para consultar
+    
+    Si `df` es un DataFrame de cargar_datos de la versión actual se lee
+    directo de la tabla Arrow del cargador (sin pasar por pandas). Añade `fila` (posición original,
+    para desempatar como pandas) y `venta_centavos` (sumas exactas que no
+    dependen del orden de los hilos).
+    """
+    pl = _polars()
+    
+    lazy = None
+    if clave_datos(df) is not None and get_version_datos(df) == get_version_actual():
+        lazy = cargar_datos_polars(COLUMNAS_POLARS)
+    if lazy is None:
+        lazy = pl.from_pandas(df[COLUMNAS_POLARS]).lazy()
+    
+    return lazy.with_row_index('fila').with_columns(
+        pl.col('dia_semana', 'restaurante', 'producto').cast(pl.String),
+        (pl.col('venta_pesos') * 100).round().cast(pl.Int64).alias('venta_centavos')
+    ).collect()
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _frame_cacheado(_df, clave):
+    return preparar_frame(_df)
+
+
+def get_frame(df):
+    """LazyFrame de esta versión de los datos (se prepara una sola vez)"""
+    clave = clave_datos(df)
+    frame = preparar_frame(df) if clave is None else _frame_cacheado(df, clave)
+    return frame.lazy()
+
+
+def _ventas():
+    return (_polars().col('venta_centavos').sum() / 100)
+
+
+# ==========================================
+# MÉTRICAS
+# ==========================================
+
+def calcular_metricas_anuales(df, año):
+    """Métricas ejecutivas anuales"""
+    pl = _polars()
+    base = get_frame(df).filter(pl.col('año') == año)
+    
+    totales, por_dia, por_mes, por_producto = pl.collect_all([
+        base.select(
+            filas=pl.len(),
+            ventas_totales=_ventas(),
+            unidades_totales=pl.col('cantidad_vendida_diaria').sum(),
+            dias_operacion=pl.col('fecha').n_unique(),
+            productos_activos=pl.col('producto').drop_nulls().n_unique()
+        ),
+        base.group_by('fecha').agg(v=_ventas()).select(pl.col('v').mean()),
+        base.group_by('mes').agg(v=_ventas()).sort(['v', 'mes'], descending=[True, False]),
+        base.filter(pl.col('producto').is_not_null()).group_by('producto').agg(v=_ventas())
+            .sort(['v', 'producto'], descending=[True, False]).head(1)
+    ])
+    
+    fila = totales.row(0, named=True)
+    if fila['filas'] == 0:
+        return None
+    
+    return {
+        'ventas_totales': fila['ventas_totales'],
+        'unidades_totales': fila['unidades_totales'],
+        'ticket_promedio': fila['ventas_totales'] / max(fila['dias_operacion'], 1),
+        'dias_operacion': fila['dias_operacion'],
+        'productos_activos': fila['productos_activos'],
+        'ventas_promedio_dia': por_dia.item(),
+        'mejor_mes': por_mes['mes'][0],
+        'peor_mes': por_mes.sort(['v', 'mes'])['mes'][0],
+        'producto_estrella': por_producto['producto'][0] if len(por_producto) > 0 else None,
+    }
+
+
+def calcular_metricas_mensuales(df, año, mes):
+    """Métricas del mes"""
+    pl = _polars()
+    frame = get_frame(df)
+    año_anterior, mes_anterior = (año, mes - 1) if mes > 1 else (año - 1, 12)
+    
+    base = frame.filter((pl.col('año') == año) & (pl.col('mes') == mes))
+    anterior = frame.filter((pl.col('año') == año_anterior) & (pl.col('mes') == mes_anterior))
+    
+    totales, por_dia, por_dia_semana, previo, top_3 = pl.collect_all([
+        base.select(filas=pl.len(), ventas_totales=_ventas(), dias_operacion=pl.col('fecha').n_unique()),
+        base.group_by('fecha').agg(v=_ventas()).sort('fecha'),
+        base.group_by('dia_semana').agg(v=_ventas()).sort(['v', 'dia_semana'], descending=[True, False]),
+        anterior.select(filas=pl.len(), v=_ventas()),
+        base.filter(pl.col('producto').is_not_null()).group_by('producto').agg(venta_pesos=_ventas())
+            .sort(['venta_pesos', 'producto'], descending=[True, False]).head(3)
+    ])
+    
+    fila = totales.row(0, named=True)
+    if fila['filas'] == 0:
+        return None
+    
+    ventas_mes = fila['ventas_totales']
+    previo = previo.row(0, named=True)
+    ventas_anterior = previo['v'] if previo['filas'] > 0 else ventas_mes
+    
+    return {
+        'ventas_totales': ventas_mes,
+        'cambio_vs_anterior': ((ventas_mes - ventas_anterior) / ventas_anterior * 100) if ventas_anterior > 0 else 0,
+        'dias_operacion': fila['dias_operacion'],
+        'ventas_promedio_dia': por_dia['v'].mean(),
+        'mejor_dia': pd.Timestamp(por_dia.sort(['v', 'fecha'], descending=[True, False])['fecha'][0]),
+        'peor_dia': pd.Timestamp(por_dia.sort(['v', 'fecha'])['fecha'][0]),
+        'mejor_dia_semana': por_dia_semana['dia_semana'][0],
+        'top_3_productos': top_3.to_pandas().set_index('producto')['venta_pesos'],
+    }
+
+
+def calcular_metricas_diarias(df, fecha):
+    """Métricas del día específico"""
+    pl = _polars()
+    frame = get_frame(df)
+    fecha = pd.Timestamp(fecha)
+    
+    base = frame.filter(pl.col('fecha') == fecha)
+    
+    totales, similares, por_producto, por_restaurante = pl.collect_all([
+        base.select(
+            filas=pl.len(),
+            ventas_totales=_ventas(),
+            unidades_vendidas=pl.col('cantidad_vendida_diaria').sum(),
+            productos_vendidos=pl.col('producto').drop_nulls().n_unique(),
+            tiene_evento=pl.col('tiene_evento').max()
+        ),
+        frame.filter(pl.col('dia_semana') == fecha.day_name()).group_by('fecha').agg(v=_ventas())
+            .select(pl.col('v').mean()),
+        base.filter(pl.col('producto').is_not_null()).group_by('producto').agg(v=_ventas())
+            .sort(['v', 'producto'], descending=[True, False]).head(1),
+        base.group_by('restaurante').agg(v=_ventas()).sort(['v', 'restaurante'], descending=[True, False]).head(1)
+    ])
+    
+    fila = totales.row(0, named=True)
+    if fila['filas'] == 0:
+        return None
+    
+    ventas_dia = fila['ventas_totales']
+    promedio_similar = similares.item()
+    
+    return {
+        'ventas_totales': ventas_dia,
+        'unidades_vendidas': fila['unidades_vendidas'],
+        'productos_vendidos': fila['productos_vendidos'],
+        'ticket_promedio': ventas_dia / max(fila['filas'], 1),
+        'vs_promedio_dia_similar': ((ventas_dia - promedio_similar) / promedio_similar * 100) if promedio_similar and promedio_similar > 0 else 0,
+        'top_producto': por_producto['producto'][0] if len(por_producto) > 0 else 'N/A',
+        'tiene_evento': fila['tiene_evento'],
+        'restaurante_lider': por_restaurante['restaurante'][0]
+    }
+
+
+def calcular_top_productos(df, top_n=10):
+    """Calcula top productos con métricas"""
+    pl = _polars()
+    
+    productos = (
+        get_frame(df)
+        .filter(pl.col('producto').is_not_null())
+        .group_by('producto')
+        .agg(
+            venta_pesos=_ventas(),
+            cantidad_vendida_diaria=pl.col('cantidad_vendida_diaria').sum(),
+            frecuencia=pl.col('fecha').count()
+        )
+        .sort(['venta_pesos', 'producto'], descending=[True, False])
+        .head(top_n)
+        .collect()
+        .to_pandas()
+        .set_index('producto')
+    )
+    
+    productos['ticket_promedio'] = productos['venta_pesos'] / productos['cantidad_vendida_diaria']
+    
+    return productos
+
+
+def calcular_productos_riesgo(df, top_n=10):
+    """Identifica productos en riesgo (mismo score que utils.metrics)"""
+    pl = _polars()
+    frame = get_frame(df)
+    
+    dias_totales = frame.select(pl.col('fecha').n_unique())
+    base = frame.filter(pl.col('producto').is_not_null()).with_columns(
+        fecha_max=pl.col('fecha').max().over('producto')
+    )
+    
+    productos = base.group_by('producto').agg(
+        primera_fila=pl.col('fila').min(),
+        filas=pl.len(),
+        ventas_total=_ventas(),
+        cantidad_media=pl.col('cantidad_vendida_diaria').mean(),
+        ventas_recientes=pl.col('venta_centavos')
+            .filter(pl.col('fecha') >= pl.col('fecha_max') - pl.duration(days=30)).sum() / 100
+    )
+    
+    # Pendiente en forma cerrada con x centrada (2x - (n - 1) es entero):
+    # una serie plana da exactamente 0
+    diario = (
+        base.group_by('producto', 'fecha').agg(cantidad=pl.col('cantidad_vendida_diaria').sum())
+        .sort('producto', 'fecha')
+        .with_columns(
+            x=pl.int_range(pl.len()).over('producto'),
+            n=pl.len().over('producto')
+        )
+    )
+    tendencias = diario.group_by('producto').agg(
+        tendencia=pl.when(pl.len() >= 5)
+            .then(((2 * pl.col('x') - (pl.col('n') - 1)) * pl.col('cantidad')).sum()
+                  / (pl.col('n').first() * (pl.col('n').first() ** 2 - 1) / 6))
+            .otherwise(0.0),
+        varianza=pl.col('cantidad').std()
+    )
+    
+    riesgo = (
+        productos.join(tendencias, on='producto').join(dias_totales.rename({'fecha': 'dias'}), how='cross')
+        .filter(pl.col('filas') >= 10)
+        .with_columns(score_riesgo=(
+            (pl.col('tendencia') < 0).cast(pl.Int64) * 30
+            + (pl.col('ventas_recientes') < pl.col('ventas_total') * 0.15).cast(pl.Int64) * 25
+            + (pl.col('varianza') > pl.col('cantidad_media')).fill_null(False).cast(pl.Int64) * 20
+            + (pl.col('filas') < pl.col('dias') * 0.3).cast(pl.Int64) * 25
+        ))
+        .sort(['score_riesgo', 'primera_fila'], descending=[True, False])
+        .head(top_n)
+        .select('producto', 'score_riesgo', 'ventas_total', 'ventas_recientes', 'tendencia')
+    )
+    
+    return riesgo.collect().to_pandas()
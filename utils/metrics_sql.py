@@ -0,0 +1,304 @@
+# utils/metrics_sql.py
+"""
+Backend SQL embebido (DuckDB) para las métricas de utils.metrics
+
+Opcional: requiere `pip install duckdb`. Registra el dataset consolidado en
+una base DuckDB en memoria (una por versión de los datos) y calcula las
+mismas métricas con consultas vectorizadas y multihilo; si la memoria no
+alcanza, DuckDB desborda a disco en data/cache/duckdb.
+
+Las funciones tienen la misma firma y resultado que sus equivalentes en
+utils.metrics; tests/test_metrics_parity.py compara ambas implementaciones.
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data_loader import CACHE_PATH, clave_datos
+
+COLUMNAS_SQL = [
+    'fecha', 'año', 'mes', 'dia_semana', 'restaurante', 'producto',
+    'venta_pesos', 'cantidad_vendida_diaria', 'tiene_evento'
+]
+
+# ==========================================
+# CONEXIÓN
+# ==========================================
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError("El backend SQL requiere duckdb: pip install duckdb") from e
+    return duckdb
+
+
+def crear_conexion(df, memoria_limite=None):
+    """Base DuckDB en memoria con la tabla `ventas` (columnas de COLUMNAS_SQL)
+    
+    `fila` guarda la posición original de cada fila, para desempatar en el
+    mismo orden que pandas; `venta_centavos` (ventas en centavos enteros,
+    como en la carga por bloques) hace que las sumas no dependan del orden
+    de los hilos, así que los empates exactos se resuelven igual que en pandas.
+    """
+    duckdb = _duckdb()
+    
+    ventas = df[COLUMNAS_SQL].assign(fila=np.arange(len(df)))
+    for col in ('dia_semana', 'restaurante', 'producto'):
+        ventas[col] = ventas[col].astype(object)
+    
+    temporal = CACHE_PATH / 'duckdb'
+    temporal.mkdir(parents=True, exist_ok=True)
+    
+    configuracion = {'temp_directory': str(temporal)}
+    if memoria_limite is not None:
+        configuracion['memory_limit'] = str(memoria_limite)
+    
+    con = duckdb.connect(config=configuracion)
+    
+    con.register('ventas_df', ventas)
+    con.execute("""
+        CREATE TABLE ventas AS
+        SELECT *, round(venta_pesos * 100)::BIGINT AS venta_centavos
+        FROM ventas_df ORDER BY fila
+    """)
+    con.unregister('ventas_df')
+    
+    return con
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _conexion_cacheada(_df, clave):
+    return crear_conexion(_df)
+
+
+def get_conexion(df):
+    """Conexión con los datos de df, cacheada si df viene de cargar_datos (un cursor propio por llamada)"""
+    clave = clave_datos(df)
+    if clave is None:
+        return crear_conexion(df)
+    return _conexion_cacheada(df, clave).cursor()
+
+
+def _fila(con, sql, parametros):
+    """Primera fila de la consulta como dict"""
+    resultado = con.execute(sql, parametros)
+    nombres = [d[0] for d in resultado.description]
+    valores = resultado.fetchone()
+    return None if valores is None else dict(zip(nombres, valores))
+
+
+# ==========================================
+# MÉTRICAS
+# ==========================================
+
+def calcular_metricas_anuales(df, año):
+    """Métricas ejecutivas anuales"""
+    con = get_conexion(df)
+    
+    fila = _fila(con, """
+        WITH base AS (SELECT * FROM ventas WHERE "año" = $año),
+        por_dia AS (SELECT fecha, sum(venta_centavos) / 100 AS v FROM base GROUP BY fecha),
+        por_mes AS (SELECT mes, sum(venta_centavos) / 100 AS v FROM base GROUP BY mes),
+        por_producto AS (
+            SELECT producto, sum(venta_centavos) / 100 AS v FROM base
+            WHERE producto IS NOT NULL GROUP BY producto
+        )
+        SELECT
+            count(*) AS filas,
+            sum(venta_centavos) / 100 AS ventas_totales,
+            sum(cantidad_vendida_diaria) AS unidades_totales,
+            count(DISTINCT fecha) AS dias_operacion,
+            count(DISTINCT producto) AS productos_activos,
+            (SELECT avg(v) FROM por_dia) AS ventas_promedio_dia,
+            (SELECT mes FROM por_mes ORDER BY v DESC, mes LIMIT 1) AS mejor_mes,
+            (SELECT mes FROM por_mes ORDER BY v, mes LIMIT 1) AS peor_mes,
+            (SELECT producto FROM por_producto ORDER BY v DESC, producto LIMIT 1) AS producto_estrella
+        FROM base
+    """, {'año': int(año)})
+    
+    if fila['filas'] == 0:
+        return None
+    
+    return {
+        'ventas_totales': fila['ventas_totales'],
+        'unidades_totales': fila['unidades_totales'],
+        'ticket_promedio': fila['ventas_totales'] / max(fila['dias_operacion'], 1),
+        'dias_operacion': fila['dias_operacion'],
+        'productos_activos': fila['productos_activos'],
+        'ventas_promedio_dia': fila['ventas_promedio_dia'],
+        'mejor_mes': fila['mejor_mes'],
+        'peor_mes': fila['peor_mes'],
+        'producto_estrella': fila['producto_estrella'],
+    }
+
+
+def calcular_metricas_mensuales(df, año, mes):
+    """Métricas del mes"""
+    con = get_conexion(df)
+    año_anterior, mes_anterior = (año, mes - 1) if mes > 1 else (año - 1, 12)
+    
+    fila = _fila(con, """
+        WITH base AS (SELECT * FROM ventas WHERE "año" = $año AND mes = $mes),
+        por_dia AS (SELECT fecha, sum(venta_centavos) / 100 AS v FROM base GROUP BY fecha),
+        por_dia_semana AS (SELECT dia_semana, sum(venta_centavos) / 100 AS v FROM base GROUP BY dia_semana),
+        anterior AS (
+            SELECT count(*) AS filas, sum(venta_centavos) / 100 AS v FROM ventas
+            WHERE "año" = $año_anterior AND mes = $mes_anterior
+        )
+        SELECT
+            count(*) AS filas,
+            sum(venta_centavos) / 100 AS ventas_totales,
+            count(DISTINCT fecha) AS dias_operacion,
+            (SELECT avg(v) FROM por_dia) AS ventas_promedio_dia,
+            (SELECT fecha FROM por_dia ORDER BY v DESC, fecha LIMIT 1) AS mejor_dia,
+            (SELECT fecha FROM por_dia ORDER BY v, fecha LIMIT 1) AS peor_dia,
+            (SELECT dia_semana FROM por_dia_semana ORDER BY v DESC, dia_semana LIMIT 1) AS mejor_dia_semana,
+            (SELECT filas FROM anterior) AS filas_anterior,
+            (SELECT v FROM anterior) AS ventas_anterior
+        FROM base
+    """, {'año': int(año), 'mes': int(mes), 'año_anterior': int(año_anterior), 'mes_anterior': int(mes_anterior)})
+    
+    if fila['filas'] == 0:
+        return None
+    
+    ventas_mes = fila['ventas_totales']
+    ventas_anterior = fila['ventas_anterior'] if fila['filas_anterior'] > 0 else ventas_mes
+    
+    top_3 = con.execute("""
+        SELECT producto, sum(venta_centavos) / 100 AS venta_pesos FROM ventas
+        WHERE "año" = $año AND mes = $mes AND producto IS NOT NULL
+        GROUP BY producto ORDER BY venta_pesos DESC, producto LIMIT 3
+    """, {'año': int(año), 'mes': int(mes)}).df().set_index('producto')['venta_pesos']
+    
+    return {
+        'ventas_totales': ventas_mes,
+        'cambio_vs_anterior': ((ventas_mes - ventas_anterior) / ventas_anterior * 100) if ventas_anterior > 0 else 0,
+        'dias_operacion': fila['dias_operacion'],
+        'ventas_promedio_dia': fila['ventas_promedio_dia'],
+        'mejor_dia': pd.Timestamp(fila['mejor_dia']),
+        'peor_dia': pd.Timestamp(fila['peor_dia']),
+        'mejor_dia_semana': fila['mejor_dia_semana'],
+        'top_3_productos': top_3,
+    }
+
+
+def calcular_metricas_diarias(df, fecha):
+    """Métricas del día específico"""
+    con = get_conexion(df)
+    fecha = pd.Timestamp(fecha)
+    
+    fila = _fila(con, """
+        WITH base AS (SELECT * FROM ventas WHERE fecha = $fecha),
+        similares AS (
+            SELECT fecha, sum(venta_centavos) / 100 AS v FROM ventas
+            WHERE dia_semana = $dia_semana GROUP BY fecha
+        ),
+        por_producto AS (
+            SELECT producto, sum(venta_centavos) / 100 AS v FROM base
+            WHERE producto IS NOT NULL GROUP BY producto
+        ),
+        por_restaurante AS (SELECT restaurante, sum(venta_centavos) / 100 AS v FROM base GROUP BY restaurante)
+        SELECT
+            count(*) AS filas,
+            sum(venta_centavos) / 100 AS ventas_totales,
+            sum(cantidad_vendida_diaria) AS unidades_vendidas,
+            count(DISTINCT producto) AS productos_vendidos,
+            max(tiene_evento) AS tiene_evento,
+            (SELECT avg(v) FROM similares) AS ventas_promedio_similar,
+            (SELECT producto FROM por_producto ORDER BY v DESC, producto LIMIT 1) AS top_producto,
+            (SELECT restaurante FROM por_restaurante ORDER BY v DESC, restaurante LIMIT 1) AS restaurante_lider
+        FROM base
+    """, {'fecha': fecha.to_pydatetime(), 'dia_semana': fecha.day_name()})
+    
+    if fila['filas'] == 0:
+        return None
+    
+    ventas_dia = fila['ventas_totales']
+    promedio_similar = fila['ventas_promedio_similar']
+    
+    return {
+        'ventas_totales': ventas_dia,
+        'unidades_vendidas': fila['unidades_vendidas'],
+        'productos_vendidos': fila['productos_vendidos'],
+        'ticket_promedio': ventas_dia / max(fila['filas'], 1),
+        'vs_promedio_dia_similar': ((ventas_dia - promedio_similar) / promedio_similar * 100) if promedio_similar and promedio_similar > 0 else 0,
+        'top_producto': fila['top_producto'],
+        'tiene_evento': fila['tiene_evento'],
+        'restaurante_lider': fila['restaurante_lider']
+    }
+
+
+def calcular_top_productos(df, top_n=10):
+    """Calcula top productos con métricas"""
+    productos = get_conexion(df).execute("""
+        SELECT
+            producto,
+            sum(venta_centavos) / 100 AS venta_pesos,
+            sum(cantidad_vendida_diaria) AS cantidad_vendida_diaria,
+            count(fecha) AS frecuencia
+        FROM ventas
+        WHERE producto IS NOT NULL
+        GROUP BY producto
+        ORDER BY venta_pesos DESC, producto
+        LIMIT $top_n
+    """, {'top_n': int(top_n)}).df().set_index('producto')
+    
+    productos['ticket_promedio'] = productos['venta_pesos'] / productos['cantidad_vendida_diaria']
+    
+    return productos
+
+
+def calcular_productos_riesgo(df, top_n=10):
+    """Identifica productos en riesgo (mismo score que utils.metrics)"""
+    return get_conexion(df).execute("""
+        WITH dias AS (SELECT count(DISTINCT fecha) AS total FROM ventas),
+        base AS (
+            SELECT *, max(fecha) OVER (PARTITION BY producto) AS fecha_max
+            FROM ventas WHERE producto IS NOT NULL
+        ),
+        productos AS (
+            SELECT
+                producto,
+                min(fila) AS primera_fila,
+                count(*) AS filas,
+                sum(venta_centavos) / 100 AS ventas_total,
+                avg(cantidad_vendida_diaria) AS cantidad_media,
+                coalesce(sum(venta_centavos) FILTER (WHERE fecha >= fecha_max - INTERVAL 30 DAY), 0) / 100 AS ventas_recientes
+            FROM base GROUP BY producto
+        ),
+        diario AS (
+            SELECT
+                producto,
+                sum(cantidad_vendida_diaria) AS cantidad,
+                row_number() OVER (PARTITION BY producto ORDER BY fecha) - 1 AS x,
+                count(*) OVER (PARTITION BY producto) AS n
+            FROM base GROUP BY producto, fecha
+        ),
+        -- Pendiente en forma cerrada con x centrada (2x - (n - 1) es entero): una
+        -- serie plana da exactamente 0, no el residuo de regr_slope
+        tendencias AS (
+            SELECT
+                producto,
+                CASE
+                    WHEN count(*) >= 5 THEN sum((2 * x - (n - 1)) * cantidad) / (any_value(n) * (any_value(n) ^ 2 - 1) / 6)
+                    ELSE 0
+                END AS tendencia,
+                stddev_samp(cantidad) AS varianza
+            FROM diario GROUP BY producto
+        )
+        SELECT
+            p.producto,
+            (t.tendencia < 0)::INTEGER * 30
+                + (p.ventas_recientes < p.ventas_total * 0.15)::INTEGER * 25
+                + coalesce(t.varianza > p.cantidad_media, false)::INTEGER * 20
+                + (p.filas < dias.total * 0.3)::INTEGER * 25 AS score_riesgo,
+            p.ventas_total,
+            p.ventas_recientes,
+            t.tendencia
+        FROM productos p JOIN tendencias t USING (producto), dias
+        WHERE p.filas >= 10
+        ORDER BY score_riesgo DESC, p.primera_fila
+        LIMIT $top_n
+    """, {'top_n': int(top_n)}).df()